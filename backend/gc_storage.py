@@ -0,0 +1,25 @@
+import argparse
+import json
+from src.db.connection import SessionLocal
+from src.models.user import User
+from src.models.document import Document
+from src.models.chat import ChatMessage
+from src.models.summary import SummaryNode
+from src.models.page import DocumentPage
+from src.models.job import Job
+from src.models.processing import ProcessingRecord
+from src.services.garbage_collector import GarbageCollector
+
+def gc_storage(dry_run: bool = False):
+    db = SessionLocal()
+    try:
+        report = GarbageCollector.collect(db, dry_run=dry_run)
+    finally:
+        db.close()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reclaim vectors, files and rows of deleted documents.")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be freed without deleting anything")
+    args = parser.parse_args()
+    gc_storage(dry_run=args.dry_run)
@@ -3,6 +3,10 @@ from src.db.connection import engine
 from src.models.user import User
 from src.models.document import Document
 from src.models.chat import ChatMessage
+from src.models.summary import SummaryNode
+from src.models.page import DocumentPage
+from src.models.job import Job
+from src.models.processing import ProcessingRecord
 
 def init_db():
     print("Creating database tables...")
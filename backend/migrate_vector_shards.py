@@ -0,0 +1,81 @@
+import argparse
+from src.db.connection import SessionLocal
+from src.models.user import User
+from src.models.document import Document
+from src.models.chat import ChatMessage
+from src.models.summary import SummaryNode
+from src.models.page import DocumentPage
+from src.models.job import Job
+from src.models.processing import ProcessingRecord
+from src.services.vector_store import vector_store, LEGACY_COLLECTION
+
+def migrate(batch_size: int = 500, delete_source: bool = False):
+    """
+    Move chunks from the legacy global "documents" collection into the
+    collections chosen by the current VECTOR_SHARDING setting.
+    """
+    source = vector_store.get_collection(LEGACY_COLLECTION)
+    db = SessionLocal()
+    owners = {}
+    moved = 0
+    orphaned = 0
+    offset = 0
+
+    try:
+        while True:
+            batch = source.get(
+                limit=batch_size,
+                offset=offset,
+                include=["embeddings", "metadatas", "documents"]
+            )
+            if not batch["ids"]:
+                break
+
+            # Group the batch by target collection
+            targets = {}
+            for i, chunk_id in enumerate(batch["ids"]):
+                metadata = dict(batch["metadatas"][i])
+                document_id = metadata.get("document_id")
+
+                if document_id not in owners:
+                    doc = db.query(Document).filter(Document.id == document_id).first()
+                    owners[document_id] = doc.user_id if doc else None
+                user_id = owners[document_id]
+                if user_id is None:
+                    orphaned += 1
+                    continue
+
+                metadata["user_id"] = user_id
+                name = vector_store.shard_name(user_id, document_id)
+                if name == LEGACY_COLLECTION:
+                    continue
+                target = targets.setdefault(name, {"ids": [], "embeddings": [], "metadatas": [], "documents": []})
+                target["ids"].append(chunk_id)
+                target["embeddings"].append(batch["embeddings"][i])
+                target["metadatas"].append(metadata)
+                target["documents"].append(batch["documents"][i])
+
+            for name, target in targets.items():
+                vector_store.get_collection(name).upsert(**target)
+                moved += len(target["ids"])
+
+            offset += len(batch["ids"])
+            print(f"Processed {offset} chunks ({moved} moved, {orphaned} without an owner)")
+
+        if delete_source and moved:
+            # Only remove chunks that now live in a shard; orphans are left for GC
+            for document_id, user_id in owners.items():
+                if user_id is not None and vector_store.shard_name(user_id, document_id) != LEGACY_COLLECTION:
+                    source.delete(where={"document_id": document_id})
+            print("Deleted migrated chunks from the legacy collection.")
+    finally:
+        db.close()
+
+    print(f"Migration complete: {moved} chunks moved, {orphaned} chunks without an owner left in place.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move vectors from the global collection into shards.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--delete-source", action="store_true", help="Remove migrated chunks from the legacy collection")
+    args = parser.parse_args()
+    migrate(batch_size=args.batch_size, delete_source=args.delete_source)
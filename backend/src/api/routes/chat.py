@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from ...db.connection import get_db
+import json
+from ...db.connection import get_db, SessionLocal
 from ...services.chat_service import ChatService
 from ...schemas.chat import ChatRequest, ChatResponse
 
@@ -32,6 +34,43 @@ async def chat_with_document(
     response, sources = await ChatService.chat(document_id, request.message, db)
     return ChatResponse(response=response, sources=sources)
 
+@router.post("/{document_id}/chat/stream")
+async def chat_with_document_stream(
+    document_id: int,
+    request: ChatRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Send a message to the document chat and stream the answer as Server-Sent Events.
+    Emits a `sources` event first, then `token` events, then `done`.
+    """
+    # Verify ownership
+    doc = db.query(Document).filter(
+        Document.id == document_id,
+        Document.user_id == current_user.id
+    ).first()
+    
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    async def event_stream():
+        # The request-scoped session may be closed before the stream finishes,
+        # so the stream uses its own session.
+        stream_db = SessionLocal()
+        try:
+            async for event in ChatService.chat_stream(document_id, request.message, stream_db):
+                payload = json.dumps(event["data"], ensure_ascii=False)
+                yield f"event: {event['event']}\ndata: {payload}\n\n"
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{document_id}/history")
 async def get_chat_history(
     document_id: int,
@@ -1,20 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List
 from ...db.connection import get_db
 from ...models.document import Document, DocumentStatus
 from ...utils.file_handler import FileHandler
-from ...schemas.document import DocumentResponse
-from ...services.document_processor import DocumentProcessor
+from ...schemas.document import DocumentResponse, PageRangeSummary, LibrarySearchResponse, ProcessingResponse
+from ...services.job_queue import JobQueue, PROCESS_DOCUMENT, PRIORITY_UPLOAD, PRIORITY_REPROCESS
+from ...services.summary_tree import SummaryTree
+from ...services.ai_scheduler import AIServiceError
+from ...services.vector_store import vector_store
+from ...services.page_store import PageStore
+from ...services.processing_tracker import ProcessingTracker
+from ...models.processing import ProcessingStage
+from ...config import settings
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Longest excerpt any generation prompt uses (AIService.generate_study_guide)
+GENERATION_INPUT_CHARS = 10000
+
 from ...api import deps
 from ...models.user import User
 
 @router.post("/upload", status_code=201, response_model=DocumentResponse)
 async def upload_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(deps.get_current_user)
@@ -38,8 +50,8 @@ async def upload_document(
     db.commit()
     db.refresh(doc)
     
-    # Trigger background processing
-    background_tasks.add_task(DocumentProcessor.process_document, doc.id, db)
+    # Queue processing; a worker picks it up with its own session
+    JobQueue.enqueue(db, PROCESS_DOCUMENT, doc.id, priority=PRIORITY_UPLOAD)
     
     return doc
 
@@ -78,6 +90,60 @@ def get_documents(
     docs = query.offset(skip).limit(limit).all()
     return docs
 
+@router.get("/search", response_model=LibrarySearchResponse)
+async def search_library(
+    q: str,
+    page: int = 1,
+    page_size: int = 10,
+    per_document: int = 3,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Semantic search across all of the current user's documents.
+    Results are grouped by document (best match first) and paginated by document.
+    `total` counts the documents matched among the nearest candidate chunks, so
+    for large libraries it is a lower bound rather than an exact count.
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    if page < 1 or not 1 <= page_size <= 100 or not 1 <= per_document <= 20:
+        raise HTTPException(status_code=400, detail="Invalid pagination parameters")
+
+    titles = dict(
+        db.query(Document.id, Document.title)
+        .filter(Document.user_id == current_user.id)
+        .all()
+    )
+
+    try:
+        groups = await vector_store.search_library(
+            current_user.id,
+            list(titles),
+            q,
+            per_document=per_document,
+            # Enough nearest chunks to fill the requested page even if every
+            # document contributes per_document of them
+            candidates=min(
+                max(settings.LIBRARY_SEARCH_CANDIDATES, page * page_size * per_document),
+                settings.LIBRARY_SEARCH_MAX_CANDIDATES
+            )
+        )
+    except AIServiceError as e:
+        raise HTTPException(status_code=503, detail=f"Error searching documents: {str(e)}")
+
+    start = (page - 1) * page_size
+    return {
+        "query": q,
+        "page": page,
+        "page_size": page_size,
+        "total": len(groups),
+        "results": [
+            {**group, "title": titles[group["document_id"]]}
+            for group in groups[start:start + page_size]
+        ]
+    }
+
 @router.get("/{document_id}", response_model=DocumentResponse)
 def get_document(
     document_id: int, 
@@ -102,7 +168,7 @@ async def delete_document(
     current_user: User = Depends(deps.get_current_user)
 ):
     """
-    Delete a document and its associated file.
+    Delete a document, its associated file and its indexed chunks.
     """
     doc = db.query(Document).filter(
         Document.id == document_id,
@@ -112,6 +178,12 @@ async def delete_document(
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
+    # Delete indexed chunks; anything left behind is picked up by the storage GC
+    try:
+        await vector_store.delete_document(doc.id, doc.user_id)
+    except Exception as e:
+        logger.error(f"Error deleting vectors for document {doc.id}: {str(e)}")
+
     # Delete physical file
     await FileHandler.delete_file(doc.file_path)
     
@@ -121,6 +193,68 @@ async def delete_document(
     
     return None
 
+@router.post("/{document_id}/reprocess", response_model=DocumentResponse)
+async def reprocess_document(
+    document_id: int,
+    file: UploadFile = File(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Process a document again, optionally replacing its file with a new version.
+    Chunks whose content is unchanged are not re-embedded.
+    """
+    doc = db.query(Document).filter(
+        Document.id == document_id,
+        Document.user_id == current_user.id
+    ).first()
+
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if doc.status == DocumentStatus.PROCESSING or JobQueue.has_pending(db, PROCESS_DOCUMENT, doc.id):
+        raise HTTPException(status_code=409, detail="Document is already being processed")
+
+    if file is not None:
+        file_info = await FileHandler.save_file(file)
+        old_path = doc.file_path
+        doc.filename = file_info["saved_filename"]
+        doc.file_path = file_info["file_path"]
+        doc.file_type = file_info["file_type"]
+        await FileHandler.delete_file(old_path)
+
+    doc.status = DocumentStatus.UPLOADED
+    db.commit()
+    db.refresh(doc)
+
+    JobQueue.enqueue(db, PROCESS_DOCUMENT, doc.id, priority=PRIORITY_REPROCESS)
+
+    return doc
+
+@router.get("/{document_id}/processing", response_model=ProcessingResponse)
+def get_processing(
+    document_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Progress and per-stage timings of the document's latest ingestion run.
+    """
+    doc = db.query(Document).filter(
+        Document.id == document_id,
+        Document.user_id == current_user.id
+    ).first()
+
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    record = ProcessingTracker.get(db, doc.id)
+    # A job waiting to start (or to retry) supersedes the record of a finished run
+    if JobQueue.has_pending(db, PROCESS_DOCUMENT, doc.id) and (record is None or record.finished_at is not None):
+        return ProcessingResponse(document_id=doc.id, stage=ProcessingStage.QUEUED)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Document has no processing record")
+    return record
+
 @router.get("/{document_id}/file")
 async def get_document_file(
     document_id: int,
@@ -151,6 +285,50 @@ async def get_document_file(
         filename=doc.filename
     )
 
+@router.get("/{document_id}/summary", response_model=PageRangeSummary)
+async def summarize_pages(
+    document_id: int,
+    start_page: int = 1,
+    end_page: int = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Summarize pages start_page..end_page from the document's cached summary tree.
+    """
+    doc = db.query(Document).filter(
+        Document.id == document_id,
+        Document.user_id == current_user.id
+    ).first()
+    
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    if end_page is None:
+        end_page = doc.page_count or start_page
+    if start_page < 1 or end_page < start_page:
+        raise HTTPException(status_code=400, detail="Invalid page range")
+    # page_count is only unknown before ingestion finishes, when there is no summary tree yet
+    if doc.page_count is not None and end_page > doc.page_count:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Page range {start_page}-{end_page} is outside the document ({doc.page_count} pages)"
+        )
+
+    try:
+        summary = await SummaryTree.summarize_range(document_id, start_page, end_page, db)
+    except AIServiceError as e:
+        raise HTTPException(status_code=503, detail=f"Error summarizing pages: {str(e)}")
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Summary not available for this document yet")
+
+    return PageRangeSummary(
+        document_id=document_id,
+        start_page=start_page,
+        end_page=end_page,
+        summary=summary
+    )
+
 @router.get("/{document_id}/export-chat")
 async def export_chat(
     document_id: int,
@@ -230,14 +408,15 @@ async def export_chat(
 @router.post("/{document_id}/glossary", response_model=List[dict])
 async def generate_document_glossary(
     document_id: int,
+    regenerate: bool = False,
     db: Session = Depends(get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
     Generate a glossary of keywords and definitions for the document.
+    Results are cached; pass regenerate=true to force a fresh variant.
     """
     from ...services.ai_service import AIService
-    from ...parsers.pdf_parser import PDFParser
 
     doc = db.query(Document).filter(
         Document.id == document_id,
@@ -246,19 +425,17 @@ async def generate_document_glossary(
     
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
+    if doc.status != DocumentStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail="Document has not finished processing")
         
     try:
-        # 1. Extract text (using existing parser logic)
-        # In a production app, we should probably cache this text or store it in DB
-        text_content = ""
-        if doc.file_type == "application/pdf":
-            parse_result = PDFParser.extract_text(doc.file_path)
-            text_content = parse_result["text"]
-        else:
-             raise HTTPException(status_code=400, detail="Only PDF files are supported for glossary generation currently")
+        # 1. Read the text stored during ingestion
+        text_content = await PageStore.get_document_text(db, doc, max_chars=GENERATION_INPUT_CHARS)
+        if text_content is None:
+             raise HTTPException(status_code=400, detail="Document text is not available for this file type")
              
         # 2. Generate glossary
-        glossary = await AIService.generate_glossary(text_content)
+        glossary = await AIService.generate_glossary(text_content, force_refresh=regenerate)
         return glossary
         
     except Exception as e:
@@ -267,14 +444,15 @@ async def generate_document_glossary(
 @router.post("/{document_id}/quiz", response_model=List[dict])
 async def generate_document_quiz(
     document_id: int,
+    regenerate: bool = False,
     db: Session = Depends(get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
     Generate an IBM-style quiz for the document.
+    Results are cached; pass regenerate=true to force a fresh variant.
     """
     from ...services.ai_service import AIService
-    from ...parsers.pdf_parser import PDFParser
 
     doc = db.query(Document).filter(
         Document.id == document_id,
@@ -283,18 +461,17 @@ async def generate_document_quiz(
     
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
+    if doc.status != DocumentStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail="Document has not finished processing")
         
     try:
-        # 1. Extract text
-        text_content = ""
-        if doc.file_type == "application/pdf":
-            parse_result = PDFParser.extract_text(doc.file_path)
-            text_content = parse_result["text"]
-        else:
-             raise HTTPException(status_code=400, detail="Only PDF files are supported for quiz generation currently")
+        # 1. Read the text stored during ingestion
+        text_content = await PageStore.get_document_text(db, doc, max_chars=GENERATION_INPUT_CHARS)
+        if text_content is None:
+             raise HTTPException(status_code=400, detail="Document text is not available for this file type")
              
         # 2. Generate quiz
-        quiz = await AIService.generate_quiz(text_content)
+        quiz = await AIService.generate_quiz(text_content, force_refresh=regenerate)
         return quiz
         
     except Exception as e:
@@ -303,15 +480,16 @@ async def generate_document_quiz(
 @router.post("/{document_id}/study-guide")
 async def generate_study_guide(
     document_id: int,
+    regenerate: bool = False,
     db: Session = Depends(get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
     Generate and download a Study Guide (Markdown file).
+    Results are cached; pass regenerate=true to force a fresh variant.
     """
     from fastapi.responses import Response
     from ...services.ai_service import AIService
-    from ...parsers.pdf_parser import PDFParser
     from datetime import datetime
 
     doc = db.query(Document).filter(
@@ -321,18 +499,17 @@ async def generate_study_guide(
     
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
+    if doc.status != DocumentStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail="Document has not finished processing")
         
     try:
-        # 1. Extract text
-        text_content = ""
-        if doc.file_type == "application/pdf":
-            parse_result = PDFParser.extract_text(doc.file_path)
-            text_content = parse_result["text"]
-        else:
-             raise HTTPException(status_code=400, detail="Only PDF files are supported")
+        # 1. Read the text stored during ingestion
+        text_content = await PageStore.get_document_text(db, doc, max_chars=GENERATION_INPUT_CHARS)
+        if text_content is None:
+             raise HTTPException(status_code=400, detail="Document text is not available for this file type")
              
         # 2. Generate guide
-        guide_content = await AIService.generate_study_guide(text_content)
+        guide_content = await AIService.generate_study_guide(text_content, force_refresh=regenerate)
         
         # 3. Return as file
         filename = f"Guia_Estudio_{doc.title}_{datetime.now().strftime('%Y%m%d')}.md"
@@ -1,7 +1,19 @@
+import asyncio
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
 from .api.api import api_router
+from .utils.cache import embedding_cache, response_cache, query_embedding_cache
+from .services.ai_service import AIService
+from .utils.singleflight import single_flight
+from .db.connection import SessionLocal, engine
+from .services.garbage_collector import GarbageCollector
+from .services.vector_store import vector_store
+from .services.job_queue import JobQueue
+from .services.job_worker import JobWorker
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -21,6 +33,63 @@ if settings.BACKEND_CORS_ORIGINS:
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+def run_storage_gc() -> dict:
+    db = SessionLocal()
+    try:
+        return GarbageCollector.collect(db)
+    finally:
+        db.close()
+
+async def storage_gc_loop():
+    while True:
+        await asyncio.sleep(settings.GC_INTERVAL_SECONDS)
+        try:
+            # The scan is synchronous I/O; keep it off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, run_storage_gc)
+        except Exception as e:
+            logger.error(f"Storage GC failed: {str(e)}")
+
+def _log_task_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background task {task.get_name()} failed: {task.exception()!r}")
+
+def start_background_task(coro, name: str) -> asyncio.Task:
+    """Start a long-running task, keeping a reference so it isn't garbage collected."""
+    task = asyncio.create_task(coro, name=name)
+    task.add_done_callback(_log_task_failure)
+    app.state.background_tasks.append(task)
+    return task
+
+app.state.background_tasks = []
+app.state.job_worker = None
+
+@app.on_event("startup")
+async def start_storage_gc():
+    if settings.GC_INTERVAL_SECONDS > 0:
+        start_background_task(storage_gc_loop(), "storage-gc")
+
+@app.on_event("startup")
+async def start_job_worker():
+    # Production runs separate `python worker.py` processes instead; the
+    # single-process SQLite setup processes uploads in the API by default
+    slots = settings.JOB_WORKERS_IN_API
+    if slots is None:
+        slots = settings.JOB_CONCURRENCY if engine.dialect.name == "sqlite" else 0
+    if slots > 0:
+        app.state.job_worker = JobWorker(slots)
+        start_background_task(app.state.job_worker.run(), "job-worker")
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    # Jobs cut short here are retried once their lock expires
+    if app.state.job_worker is not None:
+        app.state.job_worker.stop()
+    tasks = app.state.background_tasks
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    tasks.clear()
+
 @app.get("/")
 def root():
     return {"message": "Welcome to SIACTA API", "status": "running"}
@@ -29,6 +98,32 @@ def root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics/cache")
+def cache_metrics():
+    return {
+        "embeddings": embedding_cache.stats(),
+        "responses": response_cache.stats(),
+        "query_embeddings": query_embedding_cache.stats()
+    }
+
+@app.get("/metrics/ai")
+def ai_metrics():
+    metrics = {
+        kind: AIService.get_scheduler(kind).stats()
+        for kind in ("generation", "embedding")
+    }
+    metrics["single_flight"] = single_flight.stats()
+    metrics["vector_store"] = vector_store.stats()
+    return metrics
+
+@app.get("/metrics/jobs")
+def job_metrics():
+    db = SessionLocal()
+    try:
+        return JobQueue.stats(db)
+    finally:
+        db.close()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Union
+from typing import List, Optional, Union
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "SIACTA"
@@ -23,6 +23,99 @@ class Settings(BaseSettings):
     # AI
     OPENAI_API_KEY: str = ""
     GEMINI_API_KEY: str = ""
+    AI_PROVIDER: str = "gemini"  # "gemini" or "fake" (offline load testing)
+    GEMINI_GENERATION_MODEL: str = "gemini-2.5-flash"
+    GEMINI_EMBEDDING_MODEL: str = "models/text-embedding-004"
+    FAKE_AI_LATENCY_MS: int = 200
+    FAKE_AI_ERROR_RATE: float = 0.0
+    FAKE_AI_STREAM_CHUNK_CHARS: int = 20
+    FAKE_AI_STREAM_DELAY_MS: int = 30
+    AI_MAX_CONCURRENCY: int = 8  # Concurrent outbound AI calls per worker
+    # Outbound quota (shared by every process on the host through AI_QUOTA_PATH;
+    # empty for a per-process quota) and failure handling
+    AI_QUOTA_PATH: str = "storage/cache/quota.sqlite3"
+    AI_REQUESTS_PER_MINUTE: int = 1000
+    AI_TOKENS_PER_MINUTE: int = 1_000_000
+    EMBEDDING_REQUESTS_PER_MINUTE: int = 1500
+    EMBEDDING_TOKENS_PER_MINUTE: int = 1_000_000
+    AI_MAX_RETRIES: int = 5
+    AI_RETRY_BASE_DELAY_SECONDS: float = 1.0
+    AI_RETRY_MAX_DELAY_SECONDS: float = 30.0
+    AI_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive 5xx/timeout/connection errors; 429s only back off
+    AI_CIRCUIT_RESET_SECONDS: float = 30.0
+    EMBEDDING_BATCH_SIZE: int = 100  # Gemini accepts at most 100 texts per embedding request
+    EMBEDDING_CACHE_PATH: str = "storage/cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 2_000_000
+    # Chroma: "embedded" (in-process, single worker) or "http" (shared server, multi-worker)
+    CHROMA_MODE: str = "embedded"
+    CHROMA_PERSIST_DIR: str = "storage/chromadb"
+    CHROMA_HOST: str = "localhost"
+    CHROMA_PORT: int = 8001
+    # Threads for blocking vector store I/O: interactive reads vs ingestion writes
+    VECTOR_READ_CONCURRENCY: int = 8
+    VECTOR_WRITE_CONCURRENCY: int = 2
+    # Vector store sharding: "none" (single collection), "user" or "bucket"
+    VECTOR_SHARDING: str = "user"
+    VECTOR_SHARD_BUCKETS: int = 16
+    # Per-document search backend: "chroma" or "numpy" (memory-mapped exact search;
+    # Chroma still holds every chunk for cross-document queries)
+    VECTOR_SEARCH_BACKEND: str = "chroma"
+    NUMPY_INDEX_DIR: str = "storage/vectors"
+    NUMPY_INDEX_DTYPE: str = "float32"  # "float32" or "int8" (4x smaller, slightly less exact)
+    # Per-document BM25 index used alongside vector search in chat
+    LEXICAL_SEARCH: bool = True
+    LEXICAL_INDEX_DIR: str = "storage/lexical"
+    # Answer from the lexical index alone when every query term is in the top hit,
+    # its normalised score reaches LEXICAL_CONFIDENCE and it leads the runner-up by the margin
+    LEXICAL_CONFIDENCE: float = 0.8
+    LEXICAL_MARGIN: float = 1.5
+    RRF_K: int = 60  # Reciprocal rank fusion constant
+    # Nearest chunks fetched per collection for library-wide search, before grouping by
+    # document; raised for deeper pages (page * page_size * per_document) up to the max
+    LIBRARY_SEARCH_CANDIDATES: int = 200
+    LIBRARY_SEARCH_MAX_CANDIDATES: int = 2000
+    # Storage garbage collection (0 disables the periodic run)
+    GC_INTERVAL_SECONDS: int = 0
+    GC_FILE_GRACE_SECONDS: int = 3600
+    # PDF parsing process pool (0 workers = one per CPU)
+    PDF_PARSE_WORKERS: int = 0
+    PDF_PAGES_PER_TASK: int = 25
+    # Section size for formats without pages (TXT, DOCX, EPUB)
+    PARSER_SECTION_CHARS: int = 4000
+    # Chunking (token counts use the tiktoken encoding below)
+    CHUNK_TOKENIZER: str = "cl100k_base"
+    CHUNK_TARGET_TOKENS: int = 320
+    CHUNK_OVERLAP_TOKENS: int = 40
+    CHUNK_MIN_TOKENS: int = 60  # Smaller page tails are merged into the previous chunk
+    CHUNK_MIN_CHARS: int = 50
+    CHUNK_BOILERPLATE_MIN_PAGES: int = 3  # Header/footer lines seen on this many pages are dropped
+    # Streaming ingestion: flush pending chunks to the vector store at either limit
+    INGEST_UPSERT_BATCH: int = 200
+    INGEST_MAX_BUFFER_BYTES: int = 4 * 1024 * 1024
+    # Durable job queue (run workers with `python worker.py`)
+    JOB_CONCURRENCY: int = 2  # Jobs per worker process
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BASE_DELAY_SECONDS: float = 30.0
+    JOB_VISIBILITY_TIMEOUT_SECONDS: int = 300
+    JOB_HEARTBEAT_SECONDS: int = 60
+    JOB_POLL_SECONDS: float = 1.0
+    # Job slots run inside the API process. None: JOB_CONCURRENCY slots on the
+    # SQLite development database, none otherwise (run `python worker.py`)
+    JOB_WORKERS_IN_API: Optional[int] = None
+    # Coalescing of identical concurrent AI requests
+    SINGLEFLIGHT_CROSS_WORKER: bool = True
+    SINGLEFLIGHT_LOCK_PATH: str = "storage/cache/locks.sqlite3"
+    SINGLEFLIGHT_LOCK_TTL_SECONDS: float = 120.0
+    # Hierarchical summaries
+    SUMMARY_LEAF_CHARS: int = 12000  # Max text per leaf summary request
+    SUMMARY_FAN_IN: int = 4  # Nodes merged per reduce step
+    SUMMARY_CONCURRENCY: int = 4  # Parallel summary requests per document
+    RESPONSE_CACHE_PATH: str = "storage/cache/responses.sqlite3"
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10_000
+    RESPONSE_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    # In-process cache of search query embeddings (0 entries disables it)
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES: int = 10_000
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 24 * 3600
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -9,6 +9,11 @@ from alembic import context
 from src.db.base import Base
 from src.models.document import Document
 from src.models.user import User
+from src.models.chat import ChatMessage
+from src.models.summary import SummaryNode
+from src.models.page import DocumentPage
+from src.models.job import Job
+from src.models.processing import ProcessingRecord
 from src.config import settings
 
 # this is the Alembic Config object, which provides
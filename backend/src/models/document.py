@@ -37,3 +37,15 @@ class Document(Base):
     
     # Chat messages
     chat_messages = relationship("ChatMessage", back_populates="document", cascade="all, delete-orphan")
+
+    # Hierarchical summary nodes
+    summary_nodes = relationship("SummaryNode", back_populates="document", cascade="all, delete-orphan")
+
+    # Extracted text, one row per page
+    pages = relationship("DocumentPage", back_populates="document", cascade="all, delete-orphan")
+
+    # Background jobs (ingestion)
+    jobs = relationship("Job", back_populates="document", cascade="all, delete-orphan")
+
+    # Timing and progress of the latest ingestion run
+    processing = relationship("ProcessingRecord", back_populates="document", uselist=False, cascade="all, delete-orphan")
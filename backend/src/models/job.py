@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+import enum
+from ..db.base import Base
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class Job(Base):
+    """
+    A unit of background work (e.g. processing an uploaded document), stored
+    durably and executed by worker processes (see worker.py).
+    Scheduling times are epoch seconds so they compare the same on SQLite and Postgres.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_claim", "status", "priority", "available_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=True, index=True)
+    status = Column(String, nullable=False, default=JobStatus.QUEUED)
+    priority = Column(Integer, nullable=False, default=0)  # Higher runs first
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(Float, nullable=False)  # Not claimable before this time (retry backoff)
+    locked_by = Column(String, nullable=True)
+    locked_until = Column(Float, nullable=True)  # Visibility timeout; expired running jobs are reclaimed
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Relationship
+    document = relationship("Document", back_populates="jobs")
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, Text, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from ..db.base import Base
+
+class DocumentPage(Base):
+    """
+    Text extracted from one page of a document during ingestion, so features
+    that need the document text never have to parse the original file again.
+    """
+    __tablename__ = "document_pages"
+    __table_args__ = (UniqueConstraint("document_id", "page_number", name="uq_document_pages_page"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
+    page_number = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+
+    # Relationship
+    document = relationship("Document", back_populates="pages")
@@ -0,0 +1,65 @@
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+import enum
+from ..db.base import Base
+
+class ProcessingStage(str, enum.Enum):
+    QUEUED = "queued"
+    READING = "reading"          # Pages are parsed, chunked, embedded and upserted as they stream
+    SUMMARIZING = "summarizing"
+    INDEXING = "indexing"        # Last batch of chunks and publishing the local indexes
+    COMPLETED = "completed"
+
+# Share of the run each stage covers, as (start, end) percent
+STAGE_PROGRESS = {
+    ProcessingStage.READING: (0.0, 80.0),
+    ProcessingStage.SUMMARIZING: (80.0, 95.0),
+    ProcessingStage.INDEXING: (95.0, 100.0),
+}
+
+class ProcessingRecord(Base):
+    """
+    Timing and progress of the latest ingestion run of a document. Stage
+    timings are the seconds the run spent waiting on each stage; since pages
+    stream through parsing, chunking, embedding and upserting, they add up
+    to roughly total_seconds. A failed run keeps the stage it failed in.
+    """
+    __tablename__ = "processing_records"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, unique=True, index=True)
+    stage = Column(String, nullable=False, default=ProcessingStage.READING)
+    error = Column(Text, nullable=True)
+
+    # Counts
+    pages_total = Column(Integer, nullable=True)  # Unknown until the end for formats without pages
+    pages_done = Column(Integer, nullable=False, default=0)
+    chunks_indexed = Column(Integer, nullable=False, default=0)
+    chunks_embedded = Column(Integer, nullable=False, default=0)
+    chunks_skipped = Column(Integer, nullable=False, default=0)  # Near-duplicates, never embedded
+
+    # Seconds per stage
+    parse_seconds = Column(Float, nullable=False, default=0.0)
+    summarize_seconds = Column(Float, nullable=False, default=0.0)
+    chunk_seconds = Column(Float, nullable=False, default=0.0)
+    embed_seconds = Column(Float, nullable=False, default=0.0)
+    upsert_seconds = Column(Float, nullable=False, default=0.0)
+    total_seconds = Column(Float, nullable=False, default=0.0)
+
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Relationship
+    document = relationship("Document", back_populates="processing")
+
+    @property
+    def progress_percent(self) -> float:
+        """Position of the run, interpolated by pages within the reading stage."""
+        if self.stage == ProcessingStage.COMPLETED:
+            return 100.0
+        start, end = STAGE_PROGRESS.get(self.stage, (0.0, 0.0))
+        if self.stage == ProcessingStage.READING and self.pages_total:
+            start += (end - start) * min(1.0, (self.pages_done or 0) / self.pages_total)
+        return round(start, 1)
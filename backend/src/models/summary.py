@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from ..db.base import Base
+
+class SummaryNode(Base):
+    """
+    One node of a document's hierarchical summary. Level 0 nodes summarise a
+    contiguous range of pages; each higher level summarises a group of nodes
+    from the level below, up to a single root covering the whole document.
+    """
+    __tablename__ = "summary_nodes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
+    level = Column(Integer, nullable=False)
+    position = Column(Integer, nullable=False)  # Order within its level
+    page_start = Column(Integer, nullable=False)
+    page_end = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationship
+    document = relationship("Document", back_populates="summary_nodes")
@@ -0,0 +1,66 @@
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Iterator, Optional
+from fastapi import HTTPException
+from ..config import settings
+from .sections import group_paragraphs
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DC = "{http://purl.org/dc/elements/1.1/}"
+
+
+class DOCXParser:
+    @staticmethod
+    def read_info(file_path: str) -> dict:
+        """
+        Reads the author from docProps/core.xml. Word's own page count depends
+        on layout, so sections are counted while parsing instead.
+        """
+        author: Optional[str] = None
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                if "docProps/core.xml" in archive.namelist():
+                    creator = ET.fromstring(archive.read("docProps/core.xml")).find(f"{DC}creator")
+                    if creator is not None and creator.text:
+                        author = creator.text.strip()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error parsing DOCX: {str(e)}")
+        return {"page_count": None, "author": author}
+
+    @staticmethod
+    def _iter_paragraphs(file_path: str) -> Iterator[str]:
+        with zipfile.ZipFile(file_path) as archive, archive.open("word/document.xml") as xml:
+            body = None
+            for event, elem in ET.iterparse(xml, events=("start", "end")):
+                if event == "start":
+                    if elem.tag == f"{W}body":
+                        body = elem
+                    continue
+                if elem.tag != f"{W}p":
+                    continue
+
+                parts = []
+                for node in elem.iter():
+                    if node.tag == f"{W}t" and node.text:
+                        parts.append(node.text)
+                    elif node.tag == f"{W}tab":
+                        parts.append("\t")
+                    elif node.tag in (f"{W}br", f"{W}cr"):
+                        parts.append("\n")
+                yield "".join(parts)
+
+                # Drop parsed paragraphs so the tree never grows with the document
+                elem.clear()
+                if body is not None:
+                    body.clear()
+
+    @staticmethod
+    def iter_pages(file_path: str) -> Iterator[dict]:
+        """
+        Streams word/document.xml with iterparse and yields its paragraphs as
+        sections of about PARSER_SECTION_CHARS.
+        """
+        try:
+            yield from group_paragraphs(DOCXParser._iter_paragraphs(file_path), settings.PARSER_SECTION_CHARS)
+        except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+            raise HTTPException(status_code=500, detail=f"Error parsing DOCX: {str(e)}")
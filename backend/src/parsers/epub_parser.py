@@ -0,0 +1,124 @@
+import html
+import logging
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Iterator, List, Optional
+from urllib.parse import unquote
+from fastapi import HTTPException
+from ..config import settings
+from .sections import group_paragraphs
+
+logger = logging.getLogger(__name__)
+
+CONTAINER = "{urn:oasis:names:tc:opendocument:xmlns:container}"
+OPF = "{http://www.idpf.org/2007/opf}"
+DC = "{http://purl.org/dc/elements/1.1/}"
+
+# Elements whose text forms a paragraph. Containers (div, body) come last in
+# document order, so they only contribute text not already inside a block.
+BLOCK_TAGS = {
+    "p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "pre",
+    "dt", "dd", "td", "th", "caption", "figcaption", "div", "body",
+}
+SKIP_TAGS = {"head", "script", "style"}
+TAG = re.compile(r"<[^>]+>")
+BLOCK_END = re.compile(r"</(?:p|h[1-6]|li|div|blockquote|pre|tr)>|<br\s*/?>", re.IGNORECASE)
+
+
+def _local(tag) -> str:
+    return tag.rsplit("}", 1)[-1].lower() if isinstance(tag, str) else ""
+
+
+class EPUBParser:
+    @staticmethod
+    def _package(archive: zipfile.ZipFile) -> tuple:
+        """Path of the OPF package document and its parsed tree."""
+        container = ET.fromstring(archive.read("META-INF/container.xml"))
+        rootfile = container.find(f".//{CONTAINER}rootfile")
+        opf_path = rootfile.get("full-path")
+        return opf_path, ET.fromstring(archive.read(opf_path))
+
+    @staticmethod
+    def _spine(archive: zipfile.ZipFile) -> List[str]:
+        """
+        Archive paths of the book's content documents in reading order.
+        Manifest hrefs are URLs: they may be percent-encoded ("ch%201.xhtml")
+        and carry a fragment, neither of which is part of the zip entry name.
+        """
+        opf_path, package = EPUBParser._package(archive)
+        base = posixpath.dirname(opf_path)
+        manifest = {
+            item.get("id"): posixpath.normpath(posixpath.join(base, unquote(item.get("href", "").split("#", 1)[0])))
+            for item in package.iter(f"{OPF}item")
+        }
+        return [manifest[ref.get("idref")] for ref in package.iter(f"{OPF}itemref") if ref.get("idref") in manifest]
+
+    @staticmethod
+    def read_info(file_path: str) -> dict:
+        """
+        Reads the author from the OPF metadata. Sections are counted while parsing.
+        """
+        author: Optional[str] = None
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                _, package = EPUBParser._package(archive)
+                creator = package.find(f".//{DC}creator")
+                if creator is not None and creator.text:
+                    author = creator.text.strip()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error parsing EPUB: {str(e)}")
+        return {"page_count": None, "author": author}
+
+    @staticmethod
+    def _iter_chapter(archive: zipfile.ZipFile, path: str) -> Iterator[str]:
+        with archive.open(path) as xhtml:
+            skipping = 0
+            for event, elem in ET.iterparse(xhtml, events=("start", "end")):
+                name = _local(elem.tag)
+                if name in SKIP_TAGS:
+                    skipping += 1 if event == "start" else -1
+                    if event == "end":
+                        elem.clear()
+                    continue
+                if event == "end" and name in BLOCK_TAGS:
+                    if not skipping:
+                        yield " ".join("".join(elem.itertext()).split())
+                    # Keep the tail: it is text of the enclosing element
+                    tail = elem.tail
+                    elem.clear()
+                    elem.tail = tail
+
+    @staticmethod
+    def _iter_chapter_fallback(archive: zipfile.ZipFile, path: str) -> Iterator[str]:
+        """For content that isn't well-formed XML (e.g. HTML entities such as &nbsp;)."""
+        markup = archive.read(path).decode("utf-8", errors="replace")
+        markup = re.sub(r"(?is)<(head|script|style)\b.*?</\1>", " ", markup)
+        for block in BLOCK_END.split(markup):
+            yield " ".join(html.unescape(TAG.sub(" ", block)).split())
+
+    @staticmethod
+    def _iter_paragraphs(file_path: str) -> Iterator[str]:
+        with zipfile.ZipFile(file_path) as archive:
+            for path in EPUBParser._spine(archive):
+                try:
+                    # Materialise per chapter so a parse error can fall back cleanly
+                    paragraphs = list(EPUBParser._iter_chapter(archive, path))
+                except ET.ParseError:
+                    paragraphs = list(EPUBParser._iter_chapter_fallback(archive, path))
+                except KeyError:
+                    logger.warning(f"EPUB {file_path} lists a missing chapter: {path}")
+                    continue
+                yield from paragraphs
+
+    @staticmethod
+    def iter_pages(file_path: str) -> Iterator[dict]:
+        """
+        Yields the book's chapters, in spine order, as sections of about
+        PARSER_SECTION_CHARS. Chapters are read one at a time with iterparse.
+        """
+        try:
+            yield from group_paragraphs(EPUBParser._iter_paragraphs(file_path), settings.PARSER_SECTION_CHARS)
+        except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+            raise HTTPException(status_code=500, detail=f"Error parsing EPUB: {str(e)}")
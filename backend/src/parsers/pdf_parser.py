@@ -1,30 +1,135 @@
+import asyncio
+import logging
+import multiprocessing
+import os
 import pypdf
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from fastapi import HTTPException
+from typing import AsyncIterator, Iterator, List
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+
+
+def _pool_size() -> int:
+    return settings.PDF_PARSE_WORKERS or os.cpu_count() or 1
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Shared parsing pool, started on first use. Spawned, not forked, since the API process runs threads."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=_pool_size(), mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    """Discard a pool whose worker died; the next task starts a fresh one."""
+    global _pool
+    if _pool is broken:
+        _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_page(reader: pypdf.PdfReader, index: int) -> dict:
+    """Extract one page; a broken page yields empty text instead of failing the document."""
+    try:
+        return {"page_number": index + 1, "text": reader.pages[index].extract_text() or ""}
+    except Exception as e:
+        return {"page_number": index + 1, "text": "", "error": str(e)}
+
+
+def _extract_range(file_path: str, start: int, end: int) -> List[dict]:
+    """Extract pages [start, end) in a worker process."""
+    reader = pypdf.PdfReader(file_path)
+    return [_extract_page(reader, i) for i in range(start, min(end, len(reader.pages)))]
+
 
 class PDFParser:
     @staticmethod
-    def extract_text(file_path: str) -> dict:
+    def read_info(file_path: str) -> dict:
         """
-        Extracts text and metadata from a PDF file.
+        Reads the page count and metadata of a PDF without extracting any text.
         """
         try:
             reader = pypdf.PdfReader(file_path)
-            text = ""
-            pages = []
-            
-            for i, page in enumerate(reader.pages):
-                page_text = page.extract_text()
-                text += page_text + "\n"
-                pages.append({
-                    "page_number": i + 1,
-                    "text": page_text
-                })
-            
+            metadata = reader.metadata
             return {
-                "text": text,
-                "pages": pages,
                 "page_count": len(reader.pages),
-                "metadata": reader.metadata
+                "metadata": metadata,
+                "author": metadata.author if metadata else None
             }
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error parsing PDF: {str(e)}")
+
+    @staticmethod
+    def iter_pages(file_path: str) -> Iterator[dict]:
+        """
+        Yields the text of each page lazily, so only one page is held in memory at a time.
+        """
+        try:
+            reader = pypdf.PdfReader(file_path)
+            for i in range(len(reader.pages)):
+                yield _extract_page(reader, i)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error parsing PDF: {str(e)}")
+
+    @staticmethod
+    async def iter_pages_parallel(file_path: str, page_count: int) -> AsyncIterator[dict]:
+        """
+        Yields pages in order while ranges of PDF_PAGES_PER_TASK pages are
+        extracted in parallel on the process pool, keeping the event loop free.
+        At most two ranges per worker are in flight, so memory stays bounded.
+        Pages that fail to extract come back with empty text and an "error" key.
+        If a worker process dies (e.g. killed for memory on a page), the pool is
+        replaced and the range is retried once.
+        """
+        loop = asyncio.get_running_loop()
+        step = max(1, settings.PDF_PAGES_PER_TASK)
+        ranges = [(start, start + step) for start in range(0, page_count, step)]
+        max_in_flight = 2 * _pool_size()
+
+        def submit(start: int, end: int) -> tuple:
+            pool = _get_pool()
+            return start, end, pool, loop.run_in_executor(pool, _extract_range, file_path, start, end)
+
+        def finished(future) -> bool:
+            return future.done() and not future.cancelled() and future.exception() is None
+
+        # (start, end, pool, future) in page order
+        pending = []
+        retried = set()
+        next_range = 0
+        try:
+            while next_range < len(ranges) or pending:
+                while next_range < len(ranges) and len(pending) < max_in_flight:
+                    pending.append(submit(*ranges[next_range]))
+                    next_range += 1
+                start, end, pool, future = pending[0]
+                try:
+                    pages = await future
+                except BrokenProcessPool as e:
+                    if start in retried:
+                        raise HTTPException(status_code=500, detail=f"Error parsing PDF: {str(e)}")
+                    logger.warning(f"PDF worker pool broke while extracting pages {start + 1}-{end} of {file_path}; retrying on a new pool")
+                    retried.add(start)
+                    _reset_pool(pool)
+                    # Ranges still in flight on the broken pool died with it
+                    pending = [
+                        item if item[2] is not pool or finished(item[3]) else submit(item[0], item[1])
+                        for item in pending
+                    ]
+                    continue
+                except Exception as e:
+                    raise HTTPException(status_code=500, detail=f"Error parsing PDF: {str(e)}")
+                pending.pop(0)
+                for page in pages:
+                    if "error" in page:
+                        logger.warning(f"Could not extract page {page['page_number']} of {file_path}: {page['error']}")
+                    yield page
+        finally:
+            for _, _, _, future in pending:
+                future.cancel()
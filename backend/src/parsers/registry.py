@@ -0,0 +1,55 @@
+import asyncio
+from itertools import islice
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Optional
+from .pdf_parser import PDFParser
+from .txt_parser import TXTParser
+from .docx_parser import DOCXParser
+from .epub_parser import EPUBParser
+
+# Parsers by MIME type, as reported on upload
+PARSERS = {
+    "application/pdf": PDFParser,
+    "text/plain": TXTParser,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": DOCXParser,
+    "application/epub+zip": EPUBParser,
+}
+
+# Browsers often send a generic type (application/octet-stream); fall back to the extension
+EXTENSIONS = {
+    ".pdf": PDFParser,
+    ".txt": TXTParser,
+    ".docx": DOCXParser,
+    ".epub": EPUBParser,
+}
+
+
+def get_parser(file_type: Optional[str], file_path: str):
+    """
+    Parser class for a document, or None if the format isn't supported.
+    Every parser provides read_info(file_path) -> {"page_count", "author"} and
+    iter_pages(file_path), a generator of {"page_number", "text"} dicts.
+    """
+    parser = PARSERS.get((file_type or "").split(";")[0].strip().lower())
+    return parser or EXTENSIONS.get(Path(file_path).suffix.lower())
+
+
+async def iter_in_thread(pages: Iterable[dict], batch: int = 8) -> AsyncIterator[dict]:
+    """Drive a blocking page generator from a worker thread, a few pages at a time."""
+    iterator = iter(pages)
+    while True:
+        items = await asyncio.to_thread(lambda: list(islice(iterator, batch)))
+        if not items:
+            return
+        for item in items:
+            yield item
+
+
+async def iter_document_pages(parser, file_path: str, page_count: Optional[int]) -> AsyncIterator[dict]:
+    """Pages of a document without blocking the event loop."""
+    if parser is PDFParser:
+        async for page in PDFParser.iter_pages_parallel(file_path, page_count):
+            yield page
+    else:
+        async for page in iter_in_thread(parser.iter_pages(file_path)):
+            yield page
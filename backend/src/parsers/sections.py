@@ -0,0 +1,38 @@
+from typing import Iterable, Iterator
+
+
+def _split_long(paragraph: str, max_chars: int) -> Iterator[str]:
+    """Cut an oversized paragraph at whitespace into pieces of at most max_chars."""
+    # Walk an offset instead of re-slicing the remainder, so long runs stay linear
+    start = 0
+    while len(paragraph) - start > max_chars:
+        cut = paragraph.rfind(" ", start, start + max_chars)
+        if cut <= start:
+            cut = start + max_chars
+        yield paragraph[start:cut]
+        start = cut
+        while start < len(paragraph) and paragraph[start].isspace():
+            start += 1
+    if start < len(paragraph):
+        yield paragraph[start:]
+
+
+def group_paragraphs(paragraphs: Iterable[str], max_chars: int, first_page: int = 1) -> Iterator[dict]:
+    """
+    Group a stream of paragraphs into page-like sections of at most max_chars
+    (longer paragraphs are cut at whitespace). Formats without real
+    pages are indexed, summarised and cited by these section numbers.
+    """
+    page_number = first_page
+    buffer = []
+    length = 0
+    for paragraph in paragraphs:
+        for piece in _split_long(paragraph.strip(), max_chars):
+            if buffer and length + len(piece) > max_chars:
+                yield {"page_number": page_number, "text": "\n\n".join(buffer)}
+                page_number += 1
+                buffer, length = [], 0
+            buffer.append(piece)
+            length += len(piece) + 2
+    if buffer:
+        yield {"page_number": page_number, "text": "\n\n".join(buffer)}
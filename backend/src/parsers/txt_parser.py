@@ -0,0 +1,58 @@
+import codecs
+import mmap
+import os
+import re
+from typing import Iterator
+from ..config import settings
+from .sections import group_paragraphs
+
+PARAGRAPH_BREAK = re.compile(r"\r?\n\s*\r?\n")
+
+# Bytes decoded per step
+READ_BLOCK = 1024 * 1024
+
+
+class TXTParser:
+    @staticmethod
+    def read_info(file_path: str) -> dict:
+        """
+        Plain text has no pages or metadata; sections are counted while parsing.
+        """
+        return {"page_count": None, "author": None}
+
+    @staticmethod
+    def _iter_paragraphs(file_path: str) -> Iterator[str]:
+        if os.path.getsize(file_path) == 0:
+            return
+        # UTF-8 (with or without BOM); undecodable bytes are replaced, not fatal
+        decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pending = ""
+            for offset in range(0, len(data), READ_BLOCK):
+                final = offset + READ_BLOCK >= len(data)
+                pending += decoder.decode(data[offset:offset + READ_BLOCK], final=final)
+                parts = PARAGRAPH_BREAK.split(pending)
+                # The last part may continue in the next block
+                pending = parts.pop()
+                yield from parts
+                # A huge unbroken run of text is released at a line break, else at
+                # a space, else cut hard, so at most one block is carried over
+                if len(pending) > READ_BLOCK:
+                    low = len(pending) - READ_BLOCK
+                    cut = pending.rfind("\n", low)
+                    if cut <= 0:
+                        cut = pending.rfind(" ", low)
+                    if cut <= 0:
+                        cut = low
+                    yield pending[:cut]
+                    pending = pending[cut:]
+            if pending:
+                yield pending
+
+    @staticmethod
+    def iter_pages(file_path: str) -> Iterator[dict]:
+        """
+        Yields the file as sections of about PARSER_SECTION_CHARS, decoding it
+        block by block from a memory map so large dumps are never loaded whole.
+        """
+        yield from group_paragraphs(TXTParser._iter_paragraphs(file_path), settings.PARSER_SECTION_CHARS)
@@ -2,6 +2,7 @@ from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional
 from ..models.document import DocumentStatus
+from ..models.processing import ProcessingStage
 
 class DocumentBase(BaseModel):
     title: str
@@ -21,11 +22,63 @@ class DocumentResponse(DocumentBase):
     page_count: Optional[int] = None
     author: Optional[str] = None
     summary_short: Optional[str] = None
+    summary_long: Optional[str] = None
 
+    class Config:
+        from_attributes = True
+
+class ProcessingResponse(BaseModel):
+    document_id: int
+    stage: ProcessingStage
+    progress_percent: float = 0.0
+    error: Optional[str] = None
+
+    # Counts
+    pages_total: Optional[int] = None
+    pages_done: int = 0
+    chunks_indexed: int = 0
+    chunks_embedded: int = 0
+    chunks_skipped: int = 0
+
+    # Seconds per stage
+    parse_seconds: float = 0.0
+    summarize_seconds: float = 0.0
+    chunk_seconds: float = 0.0
+    embed_seconds: float = 0.0
+    upsert_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+    started_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+class PageRangeSummary(BaseModel):
+    document_id: int
+    start_page: int
+    end_page: int
+    summary: str
+
+class LibrarySearchHit(BaseModel):
+    page_number: int
+    text: str
+    distance: float
+
+class LibrarySearchResult(BaseModel):
+    document_id: int
+    title: str
+    distance: float
+    hits: list[LibrarySearchHit]
+
+class LibrarySearchResponse(BaseModel):
+    query: str
+    page: int
+    page_size: int
+    total: int  # Documents matched among the nearest candidates; a lower bound for large libraries
+    results: list[LibrarySearchResult]
+
 class GlossaryItem(BaseModel):
     term: str
     definition: str
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import math
+import random
+import re
+from typing import AsyncIterator, List, Optional
+from ..config import settings
+
+
+class AIProviderError(Exception):
+    """
+    Error raised by an AI provider. status_code mirrors the upstream HTTP
+    status when it is known (e.g. 429 for quota, 503 for unavailable).
+    """
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AIProvider:
+    """
+    Interface implemented by every generation/embedding backend.
+    """
+    name = "base"
+    generation_model = ""
+    embedding_model = ""
+    embedding_dim = 768
+
+    async def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class GeminiProvider(AIProvider):
+    """
+    Google Gemini backend. The SDK keeps one pooled async client per process,
+    so a single provider instance is shared by every request.
+    """
+    name = "gemini"
+
+    def __init__(self, api_key: str, generation_model: str, embedding_model: str):
+        # Imported here so the fake provider works without the Gemini SDK installed
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self.generation_model = generation_model
+        self.embedding_model = embedding_model
+        self._model = genai.GenerativeModel(generation_model)
+
+    async def generate(self, prompt: str) -> str:
+        response = await self._model.generate_content_async(prompt)
+        return response.text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        response = await self._model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    async def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        result = await self._genai.embed_content_async(
+            model=self.embedding_model,
+            content=texts,
+            task_type=task_type
+        )
+        return result['embedding']
+
+
+class FakeProvider(AIProvider):
+    """
+    Deterministic in-process stand-in for load testing without network or quota.
+    Latency, error rate and streaming granularity are configurable; embeddings
+    come from a feature-hashing embedder so similar texts get similar vectors.
+    """
+    name = "fake"
+    generation_model = "fake-generation"
+    embedding_model = "fake-hashing-768"
+
+    _TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+    def __init__(
+        self,
+        latency_ms: int = 0,
+        error_rate: float = 0.0,
+        stream_chunk_chars: int = 20,
+        stream_delay_ms: int = 0,
+        embedding_dim: int = 768,
+    ):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+        self.stream_delay_ms = stream_delay_ms
+        self.embedding_dim = embedding_dim
+
+    async def _simulate_call(self) -> None:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            raise AIProviderError("Simulated provider failure", status_code=503)
+
+    def _fake_response(self, prompt: str) -> str:
+        # Prompts that ask for JSON get a valid (empty) JSON list back
+        if "JSON" in prompt:
+            return "[]"
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        words = self._TOKEN_RE.findall(prompt)[-60:]
+        return f"Respuesta simulada {digest}: " + " ".join(words)
+
+    async def generate(self, prompt: str) -> str:
+        await self._simulate_call()
+        return self._fake_response(prompt)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        await self._simulate_call()
+        text = self._fake_response(prompt)
+        for start in range(0, len(text), self.stream_chunk_chars):
+            if self.stream_delay_ms:
+                await asyncio.sleep(self.stream_delay_ms / 1000)
+            yield text[start:start + self.stream_chunk_chars]
+
+    def hash_embedding(self, text: str) -> List[float]:
+        """
+        Feature-hashing embedding over unigrams and bigrams, L2-normalised.
+        """
+        vector = [0.0] * self.embedding_dim
+        tokens = self._TOKEN_RE.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.embedding_dim] += 1.0 if (h >> 63) & 1 else -1.0
+
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm == 0:
+            return vector
+        return [v / norm for v in vector]
+
+    async def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        await self._simulate_call()
+        return [self.hash_embedding(text) for text in texts]
+
+
+def create_provider() -> AIProvider:
+    """
+    Build the provider selected by settings.AI_PROVIDER.
+    """
+    if settings.AI_PROVIDER == "gemini":
+        return GeminiProvider(
+            api_key=settings.GEMINI_API_KEY,
+            generation_model=settings.GEMINI_GENERATION_MODEL,
+            embedding_model=settings.GEMINI_EMBEDDING_MODEL
+        )
+    if settings.AI_PROVIDER == "fake":
+        return FakeProvider(
+            latency_ms=settings.FAKE_AI_LATENCY_MS,
+            error_rate=settings.FAKE_AI_ERROR_RATE,
+            stream_chunk_chars=settings.FAKE_AI_STREAM_CHUNK_CHARS,
+            stream_delay_ms=settings.FAKE_AI_STREAM_DELAY_MS
+        )
+    raise ValueError(f"Unknown AI_PROVIDER: {settings.AI_PROVIDER}")
@@ -0,0 +1,324 @@
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AIServiceError(Exception):
+    """Raised when an AI call fails after retries, or cannot be attempted."""
+
+
+class CircuitOpenError(AIServiceError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+def _status(error: Exception) -> Optional[int]:
+    # Providers expose the HTTP status as status_code (ours) or code (google.api_core)
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_throttled(error: Exception) -> bool:
+    """Quota errors (429): the provider is healthy, we are just going too fast."""
+    return _status(error) == 429
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Quota (429), server-side (5xx), timeout and connection errors are worth retrying.
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = _status(error)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for the languages we handle
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate_per_minute, holding at most one
+    minute of budget. Waiters are served in arrival order.
+    """
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+class SharedTokenBucket:
+    """
+    TokenBucket kept in a SQLite file shared by every process on the host
+    (API workers and ingestion workers), so together they stay within one
+    provider quota instead of each spending it in full. Budget is reserved
+    up front and the caller sleeps off any debt, which keeps large requests
+    from being starved by small ones.
+    """
+    def __init__(self, path: str, name: str, rate_per_minute: float):
+        self.path = path
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        # Last balance seen by this process, for stats
+        self.tokens = self.capacity
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _reserve(self, amount: float) -> float:
+        """Take amount from the shared balance; return the seconds until it is covered."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                tokens = self.capacity if row is None else min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+                tokens -= amount
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self.name, tokens, now)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self.tokens = tokens
+        return max(0.0, -tokens / self.rate)
+
+    async def acquire(self, amount: float = 1) -> None:
+        amount = min(amount, self.capacity)
+        # SQLite may wait on another process's transaction; keep it off the event loop
+        wait = await asyncio.to_thread(self._reserve, amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive provider failures (5xx, timeouts,
+    connection errors) and fails fast for reset_seconds; then lets a single
+    trial call through (half-open). Quota errors don't count: the provider is
+    up, and the scheduler only backs off. A trial that is cancelled is
+    released, and one that hasn't finished within reset_seconds is presumed
+    lost, so the breaker can never stay half-open for good.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started_at = 0.0
+
+    def before_call(self) -> None:
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.reset_seconds:
+                raise CircuitOpenError("AI provider circuit is open; failing fast")
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight and now - self._trial_started_at < self.reset_seconds:
+                raise CircuitOpenError("AI provider circuit is half-open; trial call in progress")
+            self._trial_in_flight = True
+            self._trial_started_at = now
+
+    def release_trial(self) -> None:
+        """The call was abandoned (cancelled, or its stream closed) with no verdict."""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_throttled(self) -> None:
+        """A 429 is neither a failure nor a success; a half-open trial may be retried."""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("AI provider circuit opened after %d failures", self.failures)
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class AIScheduler:
+    """
+    Central gate for outbound AI calls: request and token rate limits,
+    jittered exponential backoff on retryable errors, and a circuit breaker.
+    With quota_path the limits are shared by every process on the host.
+    """
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        breaker: CircuitBreaker,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        quota_path: Optional[str] = None,
+        name: str = "default",
+    ):
+        if quota_path:
+            self.request_bucket = SharedTokenBucket(quota_path, f"{name}:requests", requests_per_minute)
+            self.token_bucket = SharedTokenBucket(quota_path, f"{name}:tokens", tokens_per_minute)
+        else:
+            self.request_bucket = TokenBucket(requests_per_minute)
+            self.token_bucket = TokenBucket(tokens_per_minute)
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.failures = 0
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter: spread retries uniformly so bursts don't resynchronise
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def admit(self, tokens: int) -> None:
+        """Wait for rate-limit budget, failing fast if the circuit is open."""
+        self.breaker.before_call()
+        try:
+            await self.request_bucket.acquire(1)
+            await self.token_bucket.acquire(tokens)
+        except BaseException:
+            self.breaker.release_trial()
+            raise
+
+    async def run(self, call: Callable[[], Awaitable[T]], tokens: int = 1) -> T:
+        """
+        Run call() under the rate limits, retrying retryable failures.
+        call must build a fresh awaitable on every invocation.
+        """
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            await self.admit(tokens)
+            try:
+                result = await call()
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered; the request itself was bad
+                    self.breaker.record_success()
+                    raise
+                if is_throttled(e):
+                    self.breaker.record_throttled()
+                else:
+                    self.breaker.record_failure()
+                last_error = e
+                if attempt == self.max_retries:
+                    break
+                self.retries += 1
+                delay = self.backoff(attempt)
+                logger.warning("Retryable AI error (%s); retry %d in %.2fs", e, attempt + 1, delay)
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Cancelled: no verdict on the provider, but don't hold a half-open trial
+                self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+        self.failures += 1
+        raise AIServiceError(f"AI call failed after {self.max_retries + 1} attempts: {last_error}") from last_error
+
+    async def stream(self, make_stream: Callable[[], AsyncIterator[T]], tokens: int = 1) -> AsyncIterator[T]:
+        """
+        Streaming counterpart of run(). Retries only happen before the first
+        item reaches the caller; a failure mid-stream is raised as AIServiceError.
+        """
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            await self.admit(tokens)
+            started = False
+            try:
+                async for item in make_stream():
+                    started = True
+                    yield item
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.record_success()
+                    raise
+                if is_throttled(e):
+                    self.breaker.record_throttled()
+                else:
+                    self.breaker.record_failure()
+                last_error = e
+                if started or attempt == self.max_retries:
+                    break
+                self.retries += 1
+                delay = self.backoff(attempt)
+                logger.warning("Retryable AI error (%s); retry %d in %.2fs", e, attempt + 1, delay)
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Cancelled, or the consumer closed the stream (GeneratorExit)
+                self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                return
+
+        self.failures += 1
+        raise AIServiceError(f"AI stream failed: {last_error}") from last_error
+
+    def stats(self) -> dict:
+        return {
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "retries": self.retries,
+            "failures": self.failures,
+            "available_requests": round(self.request_bucket.tokens, 1),
+            "available_tokens": round(self.token_bucket.tokens, 1),
+        }
@@ -1,64 +1,257 @@
-import google.generativeai as genai
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import AsyncIterator
 from ..config import settings
+from ..utils.cache import embedding_cache, response_cache
+from ..utils.singleflight import single_flight, run_once_across_workers
+from .ai_providers import AIProvider, create_provider
+from .ai_scheduler import AIScheduler, AIServiceError, CircuitBreaker, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Bump a version whenever its prompt template changes so cached responses are regenerated.
+PROMPT_VERSIONS = {
+    "summary": "v1",
+    "glossary": "v1",
+    "quiz": "v1",
+    "study_guide": "v1",
+    "section_summary": "v1",
+    "summary_reduce": "v1",
+}
 
 class AIService:
+    # Shared across requests: the provider (and its pooled client) is
+    # created once per process and reused.
+    _provider = None
+    _semaphore = None
+    _breaker = None
+    _schedulers = {}
+
+    @staticmethod
+    def get_provider() -> AIProvider:
+        """Return the shared AI provider selected in settings, creating it on first use."""
+        if AIService._provider is None:
+            AIService._provider = create_provider()
+        return AIService._provider
+
+    @staticmethod
+    def _get_semaphore() -> asyncio.Semaphore:
+        """Bound the number of in-flight AI calls per worker."""
+        if AIService._semaphore is None:
+            AIService._semaphore = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY)
+        return AIService._semaphore
+
+    @staticmethod
+    def get_scheduler(kind: str) -> AIScheduler:
+        """
+        Return the outbound scheduler for "generation" or "embedding" calls.
+        Each kind has its own quota, shared with the other processes on the
+        host; both share one circuit breaker.
+        """
+        if AIService._breaker is None:
+            AIService._breaker = CircuitBreaker(
+                settings.AI_CIRCUIT_FAILURE_THRESHOLD,
+                settings.AI_CIRCUIT_RESET_SECONDS
+            )
+        if kind not in AIService._schedulers:
+            if kind == "embedding":
+                requests_per_minute = settings.EMBEDDING_REQUESTS_PER_MINUTE
+                tokens_per_minute = settings.EMBEDDING_TOKENS_PER_MINUTE
+            else:
+                requests_per_minute = settings.AI_REQUESTS_PER_MINUTE
+                tokens_per_minute = settings.AI_TOKENS_PER_MINUTE
+            AIService._schedulers[kind] = AIScheduler(
+                requests_per_minute=requests_per_minute,
+                tokens_per_minute=tokens_per_minute,
+                breaker=AIService._breaker,
+                max_retries=settings.AI_MAX_RETRIES,
+                base_delay=settings.AI_RETRY_BASE_DELAY_SECONDS,
+                max_delay=settings.AI_RETRY_MAX_DELAY_SECONDS,
+                quota_path=settings.AI_QUOTA_PATH or None,
+                name=kind
+            )
+        return AIService._schedulers[kind]
+
+    @staticmethod
+    async def _generate(prompt: str) -> str:
+        """
+        Run a generation request without blocking the event loop, under the
+        outbound rate limits, retries and circuit breaker.
+        """
+        provider = AIService.get_provider()
+
+        async def call():
+            async with AIService._get_semaphore():
+                return await provider.generate(prompt)
+
+        return await AIService.get_scheduler("generation").run(call, estimate_tokens(prompt))
+
+    @staticmethod
+    async def _generate_cached(kind: str, input_text: str, prompt: str, force_refresh: bool = False, parse=None):
+        """
+        Run a generation request through the response cache.
+        The cache key is (kind, template version, model, hash of input_text). Only
+        successful results are stored; parse, if given, runs before caching so
+        malformed responses are never cached.
+        """
+        model = AIService.get_provider().generation_model
+        cache_key = response_cache.make_key(kind, PROMPT_VERSIONS[kind], model, input_text)
+        if not force_refresh:
+            # The cache is SQLite-backed; keep its reads and writes off the event loop
+            cached = await asyncio.to_thread(response_cache.get, cache_key)
+            if cached is not None:
+                return cached
+
+        async def generate_and_store():
+            result = await AIService._generate(prompt)
+            if parse is not None:
+                result = parse(result)
+            await asyncio.to_thread(response_cache.put, cache_key, result)
+            return result
+
+        if force_refresh:
+            # Coalesce double-clicked regenerations, but never serve the old cached value
+            return await single_flight.do(f"refresh:{cache_key}", generate_and_store)
+
+        # Identical requests share one generation: in-process via single-flight,
+        # and across workers by waiting for the leader to fill the shared cache
+        return await single_flight.do(cache_key, lambda: run_once_across_workers(
+            cache_key,
+            generate_and_store,
+            lambda: response_cache.get(cache_key, record_stats=False)
+        ))
+
     @staticmethod
-    def _get_model():
-        """Configure and return Gemini model."""
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        return genai.GenerativeModel('gemini-2.5-flash')
-    
+    def _parse_json_list(response_text: str) -> list[dict]:
+        # Clean response if it contains markdown code blocks
+        clean_text = response_text.replace("```json", "").replace("```", "").strip()
+        return json.loads(clean_text)
+
     @staticmethod
-    async def generate_summary(text: str) -> str:
+    async def _embed(texts: list[str], task_type: str) -> list[list[float]]:
         """
-        Generate document summary using Gemini.
+        Run an embedding request for a list of texts without blocking the event
+        loop, under the outbound rate limits, retries and circuit breaker.
+        """
+        provider = AIService.get_provider()
+
+        async def call():
+            async with AIService._get_semaphore():
+                return await provider.embed(texts, task_type)
+
+        tokens = sum(estimate_tokens(text) for text in texts)
+        return await AIService.get_scheduler("embedding").run(call, tokens)
+
+    @staticmethod
+    async def generate_summary(text: str, force_refresh: bool = False) -> str:
+        """
+        Generate document summary using the configured AI provider.
         """
         try:
-            model = AIService._get_model()
-            
+            excerpt = text[:4000]
             prompt = f"""Genera un resumen conciso y claro del siguiente documento en español.
 El resumen debe capturar los puntos principales y la idea general del contenido.
 Máximo 3-4 oraciones.
 
 Documento:
-{text[:4000]}
+{excerpt}
 
 Resumen:"""
             
-            response = model.generate_content(prompt)
-            return response.text
+            return await AIService._generate_cached("summary", excerpt, prompt, force_refresh)
             
         except Exception as e:
-            print(f"Error generating summary with Gemini: {e}")
+            print(f"Error generating summary: {e}")
             return "Error al generar el resumen. Por favor, intenta de nuevo."
 
     @staticmethod
-    async def get_embeddings(text: str) -> list[float]:
+    async def summarize_section(text: str) -> str:
         """
-        Generate embeddings using Gemini.
+        Summarise one section (a range of pages) of a document.
+        Unlike generate_summary, errors propagate so callers never store an
+        error message as a summary.
         """
-        try:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            result = genai.embed_content(
-                model="models/text-embedding-004",
-                content=text,
-                task_type="retrieval_document"
-            )
-            return result['embedding']
-        except Exception as e:
-            print(f"Error generating embeddings with Gemini: {e}")
-            # Return zero vector as fallback
-            return [0.0] * 768
+        prompt = f"""Resume la siguiente sección de un documento en español.
+Conserva los conceptos, datos y conclusiones principales en un párrafo de 5-8 oraciones.
+
+Sección:
+{text}
+
+Resumen:"""
+        return await AIService._generate_cached("section_summary", text, prompt)
 
     @staticmethod
-    async def generate_chat_response(context: str, question: str) -> str:
+    async def combine_summaries(summaries: list[str]) -> str:
         """
-        Generate chat response using Gemini with context from document.
+        Merge consecutive section summaries into one summary of the whole span.
+        Errors propagate, as in summarize_section.
         """
-        try:
-            model = AIService._get_model()
-            
-            prompt = f"""Eres un asistente inteligente que ayuda a responder preguntas sobre documentos.
+        joined = "\n\n".join(f"[Parte {i + 1}]\n{summary}" for i, summary in enumerate(summaries))
+        prompt = f"""Los siguientes son resúmenes de partes consecutivas de un mismo documento.
+Combínalos en un único resumen coherente en español que cubra todas las partes, sin repetir ideas.
+Máximo 8-10 oraciones.
+
+{joined}
+
+Resumen combinado:"""
+        return await AIService._generate_cached("summary_reduce", joined, prompt)
+
+    @staticmethod
+    async def get_embeddings(text: str, task_type: str = "retrieval_document") -> list[float]:
+        """
+        Generate embeddings, served from the embedding cache when possible.
+        Raises AIServiceError if the provider cannot produce a vector.
+        """
+        provider = AIService.get_provider()
+        # The cache is SQLite-backed; keep its reads and writes off the event loop
+        cached = await asyncio.to_thread(embedding_cache.get, provider.embedding_model, task_type, text)
+        if cached is not None:
+            return cached
+
+        embedding = (await AIService._embed([text], task_type))[0]
+        await asyncio.to_thread(embedding_cache.put, provider.embedding_model, task_type, text, embedding)
+        return embedding
+
+    @staticmethod
+    async def get_embeddings_batch(texts: list[str], task_type: str = "retrieval_document") -> list[list[float]]:
+        """
+        Generate embeddings for many texts, sending cache misses to the provider in
+        batches of settings.EMBEDDING_BATCH_SIZE. Batches are dispatched
+        concurrently and paced by the embedding scheduler. Returns one vector per
+        input text, in order; raises AIServiceError if any batch ultimately fails.
+        """
+        provider = AIService.get_provider()
+        batch_size = max(1, settings.EMBEDDING_BATCH_SIZE)
+        embeddings = await asyncio.to_thread(embedding_cache.get_many, provider.embedding_model, task_type, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+        async def embed_batch(batch_number: int, batch_indexes: list[int]):
+            batch = [texts[i] for i in batch_indexes]
+            started_at = time.perf_counter()
+            try:
+                batch_embeddings = await AIService._embed(batch, task_type)
+            finally:
+                logger.info(
+                    "Embedding batch %d (%d texts) took %.3fs",
+                    batch_number, len(batch), time.perf_counter() - started_at
+                )
+            await asyncio.to_thread(embedding_cache.put_many, provider.embedding_model, task_type, batch, batch_embeddings)
+            for i, embedding in zip(batch_indexes, batch_embeddings):
+                embeddings[i] = embedding
+
+        await asyncio.gather(*(
+            embed_batch(number + 1, missing[start:start + batch_size])
+            for number, start in enumerate(range(0, len(missing), batch_size))
+        ))
+
+        return embeddings
+
+    @staticmethod
+    def _chat_prompt(context: str, question: str) -> str:
+        return f"""Eres un asistente inteligente que ayuda a responder preguntas sobre documentos.
 Usa el siguiente contexto del documento para responder la pregunta del usuario de forma precisa y útil.
 Si la respuesta no está en el contexto, indícalo claramente.
 
@@ -68,22 +261,51 @@ Contexto del documento:
 Pregunta del usuario: {question}
 
 Respuesta (en español, clara y concisa):"""
-            
-            response = model.generate_content(prompt)
-            return response.text
+
+    @staticmethod
+    async def generate_chat_response(context: str, question: str) -> str:
+        """
+        Generate chat response with context from document.
+        """
+        try:
+            prompt = AIService._chat_prompt(context, question)
+            # Identical questions over the same context share one in-flight generation
+            flight_key = "chat:" + hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+            return await single_flight.do(flight_key, lambda: AIService._generate(prompt))
             
         except Exception as e:
-            print(f"Error generating chat response with Gemini: {e}")
+            print(f"Error generating chat response: {e}")
             return f"Lo siento, hubo un error al procesar tu pregunta: {str(e)}"
 
     @staticmethod
-    async def generate_glossary(text: str) -> list[dict]:
+    async def stream_chat_response(context: str, question: str) -> AsyncIterator[str]:
         """
-        Extract keywords and definitions using Gemini.
+        Generate chat response, yielding text fragments as they arrive.
         """
         try:
-            model = AIService._get_model()
-            
+            prompt = AIService._chat_prompt(context, question)
+            provider = AIService.get_provider()
+
+            async def make_stream():
+                async with AIService._get_semaphore():
+                    async for fragment in provider.stream(prompt):
+                        yield fragment
+
+            scheduler = AIService.get_scheduler("generation")
+            async for fragment in scheduler.stream(make_stream, estimate_tokens(prompt)):
+                yield fragment
+
+        except Exception as e:
+            print(f"Error streaming chat response: {e}")
+            yield f"Lo siento, hubo un error al procesar tu pregunta: {str(e)}"
+
+    @staticmethod
+    async def generate_glossary(text: str, force_refresh: bool = False) -> list[dict]:
+        """
+        Extract keywords and definitions using the configured AI provider.
+        """
+        try:
+            excerpt = text[:6000]
             prompt = f"""Analiza el siguiente texto y extrae las 10-15 palabras clave, términos técnicos o conceptos más importantes.
 Para cada término, genera una definición breve y clara basada en el contexto o en conocimiento general si es un término estándar.
 Devuelve el resultado SOLO como una lista JSON válida, sin texto adicional ni bloques de código markdown.
@@ -95,29 +317,24 @@ Formato esperado:
 ]
 
 Texto:
-{text[:6000]}
+{excerpt}
 """
             
-            response = model.generate_content(prompt)
-            
-            # Clean response if it contains markdown code blocks
-            clean_text = response.text.replace("```json", "").replace("```", "").strip()
-            
-            import json
-            return json.loads(clean_text)
+            return await AIService._generate_cached(
+                "glossary", excerpt, prompt, force_refresh, parse=AIService._parse_json_list
+            )
             
         except Exception as e:
-            print(f"Error generating glossary with Gemini: {e}")
+            print(f"Error generating glossary: {e}")
             return []
 
     @staticmethod
-    async def generate_quiz(text: str) -> list[dict]:
+    async def generate_quiz(text: str, force_refresh: bool = False) -> list[dict]:
         """
-        Generate a multiple choice quiz using Gemini.
+        Generate a multiple choice quiz using the configured AI provider.
         """
         try:
-            model = AIService._get_model()
-            
+            excerpt = text[:8000]
             prompt = f"""Genera un examen tipo certificación "IBM" de 10 preguntas de opción múltiple basado en el siguiente texto.
 Las preguntas deben evaluar la comprensión profunda y la aplicación de conceptos, no solo la memorización.
 Formato de salida: SOLO una lista JSON válida.
@@ -131,29 +348,24 @@ Estructura de cada pregunta:
 }}
 
 Texto:
-{text[:8000]}
+{excerpt}
 """
             
-            response = model.generate_content(prompt)
-            
-            # Clean response if it contains markdown code blocks
-            clean_text = response.text.replace("```json", "").replace("```", "").strip()
-            
-            import json
-            return json.loads(clean_text)
+            return await AIService._generate_cached(
+                "quiz", excerpt, prompt, force_refresh, parse=AIService._parse_json_list
+            )
             
         except Exception as e:
-            print(f"Error generating quiz with Gemini: {e}")
+            print(f"Error generating quiz: {e}")
             return []
 
     @staticmethod
-    async def generate_study_guide(text: str) -> str:
+    async def generate_study_guide(text: str, force_refresh: bool = False) -> str:
         """
         Generate a comprehensive study guide in Markdown format.
         """
         try:
-            model = AIService._get_model()
-            
+            excerpt = text[:10000]
             prompt = f"""Actúa como un profesor experto y crea una Guía de Estudio detallada y estructurada basada en el siguiente texto.
 La guía debe estar en formato Markdown puro para ser descargada y leída fácilmente.
 
@@ -173,13 +385,12 @@ Extractos clave o ideas fuerza que el estudiante debe recordar.
 3-4 preguntas abiertas para ayudar a profundizar en el tema.
 
 Texto base:
-{text[:10000]}
+{excerpt}
 """
             
-            response = model.generate_content(prompt)
-            return response.text
+            return await AIService._generate_cached("study_guide", excerpt, prompt, force_refresh)
             
         except Exception as e:
-            print(f"Error generating study guide with Gemini: {e}")
+            print(f"Error generating study guide: {e}")
             return "# Error al generar la guía\nLo siento, ocurrió un error. Intenta de nuevo."
 
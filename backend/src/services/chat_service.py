@@ -1,11 +1,104 @@
 from .vector_store import vector_store
 from .ai_service import AIService
+from .ai_scheduler import AIServiceError
 from ..models.document import Document
 from ..models.chat import ChatMessage, MessageRole
+from ..config import settings
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
+from typing import AsyncIterator, List
+import logging
+
+logger = logging.getLogger(__name__)
 
 class ChatService:
+    @staticmethod
+    def _save_message(db: Session, document_id: int, role: MessageRole, content: str) -> None:
+        message = ChatMessage(
+            document_id=document_id,
+            role=role,
+            content=content
+        )
+        db.add(message)
+        db.commit()
+
+    @staticmethod
+    def _lexical_is_confident(lexical: dict) -> bool:
+        """
+        True when the BM25 hit is strong enough to skip the embedding call:
+        the top chunk contains every query term, scores close to the query's
+        maximum, and clearly beats the runner-up.
+        """
+        results = lexical["results"]
+        if not results or lexical["coverage"] < 1.0 or lexical["confidence"] < settings.LEXICAL_CONFIDENCE:
+            return False
+        return len(results) == 1 or results[0]["score"] >= settings.LEXICAL_MARGIN * results[1]["score"]
+
+    @staticmethod
+    def _fuse(rankings: List[list], limit: int) -> list:
+        """
+        Reciprocal rank fusion: each chunk scores sum(1 / (RRF_K + rank)) over
+        the rankings it appears in.
+        """
+        scores = {}
+        chunks = {}
+        for ranking in rankings:
+            for rank, result in enumerate(ranking):
+                key = (result["metadata"].get("page_number", 0), result["text"])
+                scores[key] = scores.get(key, 0.0) + 1.0 / (settings.RRF_K + rank + 1)
+                chunks.setdefault(key, result)
+        best = sorted(scores, key=lambda key: -scores[key])[:limit]
+        return [chunks[key] for key in best]
+
+    @staticmethod
+    async def _retrieve(doc: Document, message: str, limit: int = 3) -> list:
+        """
+        Search the document for context: BM25 first, answering from it alone
+        when it is confident, otherwise fused with vector search. If the AI
+        provider cannot embed the query, fall back to the lexical results
+        rather than failing the whole chat.
+        """
+        lexical = None
+        if settings.LEXICAL_SEARCH:
+            lexical = await vector_store.lexical_search(doc.id, message, limit * 2)
+            if lexical and ChatService._lexical_is_confident(lexical):
+                return lexical["results"][:limit]
+
+        try:
+            semantic = await vector_store.search(doc.id, message, limit=limit * 2, user_id=doc.user_id)
+        except AIServiceError as e:
+            logger.warning(f"Context retrieval failed for document {doc.id}: {e}")
+            semantic = []
+
+        if not lexical:
+            return semantic[:limit]
+        return ChatService._fuse([lexical["results"], semantic], limit)
+
+    @staticmethod
+    def _build_context(context_results: list) -> tuple[str, list]:
+        """
+        Turn retrieval results into a prompt context and a list of cited pages.
+        """
+        sources = []
+        seen_pages = set()
+
+        if not context_results:
+            return "No se encontró contexto relevante en el documento.", sources
+
+        chunks_text = []
+        for result in context_results:
+            text = result["text"]
+            metadata = result["metadata"]
+            page_num = metadata.get("page_number", 0)
+
+            chunks_text.append(f"[Página {page_num}]\n{text}")
+
+            if page_num > 0 and page_num not in seen_pages:
+                sources.append({"page": page_num})
+                seen_pages.add(page_num)
+
+        return "\n\n".join(chunks_text), sources
+
     @staticmethod
     async def chat(document_id: int, message: str, db: Session) -> tuple[str, list]:
         """
@@ -17,48 +110,49 @@ class ChatService:
             raise HTTPException(status_code=404, detail="Document not found")
 
         # 1. Save user message
-        user_message = ChatMessage(
-            document_id=document_id,
-            role=MessageRole.USER,
-            content=message
-        )
-        db.add(user_message)
-        db.commit()
+        ChatService._save_message(db, document_id, MessageRole.USER, message)
 
         # 2. Retrieve relevant context
-        context_results = await vector_store.search(document_id, message)
-        
-        context_str = ""
-        sources = []
-        seen_pages = set()
-
-        if not context_results:
-            context_str = "No se encontró contexto relevante en el documento."
-        else:
-            chunks_text = []
-            for result in context_results:
-                text = result["text"]
-                metadata = result["metadata"]
-                page_num = metadata.get("page_number", 0)
-                
-                chunks_text.append(f"[Página {page_num}]\n{text}")
-                
-                if page_num > 0 and page_num not in seen_pages:
-                    sources.append({"page": page_num})
-                    seen_pages.add(page_num)
-            
-            context_str = "\n\n".join(chunks_text)
+        context_results = await ChatService._retrieve(doc, message)
+        context_str, sources = ChatService._build_context(context_results)
 
         # 3. Generate Response using AI
         response = await AIService.generate_chat_response(context_str, message)
-        
+
         # 4. Save AI response
-        ai_message = ChatMessage(
-            document_id=document_id,
-            role=MessageRole.AI,
-            content=response
-        )
-        db.add(ai_message)
-        db.commit()
-        
+        ChatService._save_message(db, document_id, MessageRole.AI, response)
+
         return response, sources
+
+    @staticmethod
+    async def chat_stream(document_id: int, message: str, db: Session) -> AsyncIterator[dict]:
+        """
+        Streaming variant of chat. Yields events in order:
+        {"event": "sources", ...} as soon as retrieval finishes, then one
+        {"event": "token", ...} per generated fragment, then {"event": "done"}.
+        The assembled AI message is persisted once the stream completes.
+        """
+        doc = db.query(Document).filter(Document.id == document_id).first()
+        if not doc:
+            raise HTTPException(status_code=404, detail="Document not found")
+
+        # 1. Save user message
+        ChatService._save_message(db, document_id, MessageRole.USER, message)
+
+        # 2. Retrieve relevant context and announce sources right away
+        context_results = await ChatService._retrieve(doc, message)
+        context_str, sources = ChatService._build_context(context_results)
+        yield {"event": "sources", "data": sources}
+
+        # 3. Forward the AI response as it is generated
+        fragments = []
+        try:
+            async for fragment in AIService.stream_chat_response(context_str, message):
+                fragments.append(fragment)
+                yield {"event": "token", "data": fragment}
+        finally:
+            # 4. Save whatever was generated, even if the client disconnected early
+            if fragments:
+                ChatService._save_message(db, document_id, MessageRole.AI, "".join(fragments))
+
+        yield {"event": "done", "data": None}
@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import re
+from collections import Counter
+from typing import Iterator, List
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.!?…:;])\s+")
+DIGITS = re.compile(r"\d+")
+WHITESPACE = re.compile(r"\s+")
+WORD = re.compile(r"\w+")
+
+_encoding = None
+
+
+def _get_encoding():
+    """
+    Load the tiktoken encoding once. If tiktoken or its BPE file is unavailable
+    the chunker falls back to the same 4-characters-per-token estimate the AI
+    scheduler uses.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(settings.CHUNK_TOKENIZER)
+        except Exception as e:
+            logger.warning(f"tiktoken unavailable ({e}); estimating tokens from length")
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def _split_tokens(text: str, max_tokens: int) -> List[str]:
+    """Hard split for a single sentence longer than a whole chunk."""
+    encoding = _get_encoding()
+    if encoding:
+        tokens = encoding.encode(text, disallowed_special=())
+        return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+    step = max_tokens * 4
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+
+def _normalize_line(line: str) -> str:
+    # Page numbers and dates change from page to page; the rest of a header doesn't
+    return DIGITS.sub("#", WHITESPACE.sub(" ", line.strip().lower()))
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word trigrams; near-identical texts differ in few bits."""
+    words = WORD.findall(text.lower())
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    weights = [0] * 64
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+class Chunker:
+    """
+    Token-aware chunker for one document. Text is packed into chunks of about
+    CHUNK_TARGET_TOKENS, breaking on paragraph and then sentence boundaries and
+    carrying up to CHUNK_OVERLAP_TOKENS of whole sentences into the next chunk.
+    Across pages it learns repeated header/footer lines and drops them, and it
+    skips chunks that are near-duplicates of one already produced, so they
+    are never embedded.
+    """
+    # Only the first and last lines of a page are header/footer candidates
+    edge_lines = 3
+    max_boilerplate_chars = 120
+    # Max differing SimHash bits for two chunks to count as near-duplicates
+    max_duplicate_distance = 3
+
+    def __init__(self):
+        self.target_tokens = settings.CHUNK_TARGET_TOKENS
+        self.overlap_tokens = settings.CHUNK_OVERLAP_TOKENS
+        self.min_tokens = settings.CHUNK_MIN_TOKENS
+        self._line_counts = Counter()
+        # SimHash band -> fingerprints, for near-duplicate lookups without a full scan
+        self._bands = {}
+        self.skipped_lines = 0
+        self.skipped_chunks = 0
+
+    def _strip_boilerplate(self, text: str) -> str:
+        lines = text.split("\n")
+        edges = set(range(min(self.edge_lines, len(lines)))) | set(range(max(0, len(lines) - self.edge_lines), len(lines)))
+        kept = []
+        seen = set()
+        for i, line in enumerate(lines):
+            if i in edges and line.strip() and len(line) <= self.max_boilerplate_chars:
+                key = _normalize_line(line)
+                if key not in seen:
+                    seen.add(key)
+                    self._line_counts[key] += 1
+                if self._line_counts[key] >= settings.CHUNK_BOILERPLATE_MIN_PAGES:
+                    self.skipped_lines += 1
+                    continue
+            kept.append(line)
+        return "\n".join(kept)
+
+    def _is_duplicate(self, chunk: str) -> bool:
+        fingerprint = simhash(chunk)
+        bands = [(band, fingerprint >> (16 * band) & 0xFFFF) for band in range(4)]
+        # Fingerprints within 3 bits share at least one of four 16-bit bands
+        for band in bands:
+            for other in self._bands.get(band, ()):
+                if bin(fingerprint ^ other).count("1") <= self.max_duplicate_distance:
+                    return True
+        for band in bands:
+            self._bands.setdefault(band, []).append(fingerprint)
+        return False
+
+    def _sentences(self, text: str) -> Iterator[tuple]:
+        """Yield (sentence, tokens, starts_paragraph), splitting oversized sentences."""
+        for paragraph in PARAGRAPH_BREAK.split(text):
+            paragraph = WHITESPACE.sub(" ", paragraph).strip()
+            first = True
+            for sentence in SENTENCE_END.split(paragraph):
+                if not sentence:
+                    continue
+                tokens = count_tokens(sentence)
+                pieces = [sentence] if tokens <= self.target_tokens else _split_tokens(sentence, self.target_tokens)
+                for piece in pieces:
+                    yield piece, count_tokens(piece) if len(pieces) > 1 else tokens, first
+                    first = False
+
+    def _pack(self, text: str) -> List[str]:
+        chunks = []
+        current, current_tokens = [], 0
+        # Leading sentences of `current` repeated from the previous chunk
+        carried = 0
+        for sentence, tokens, starts_paragraph in self._sentences(text):
+            # Close the chunk at a paragraph break once it is reasonably full,
+            # or wherever the next sentence would overflow it
+            full = current_tokens + tokens > self.target_tokens
+            if len(current) > carried and (full or (starts_paragraph and current_tokens >= self.target_tokens * 3 // 4)):
+                chunks.append(" ".join(s for s, _ in current))
+                overlap, overlap_tokens = [], 0
+                for s, t in reversed(current):
+                    if overlap_tokens + t + tokens > self.target_tokens or overlap_tokens + t > self.overlap_tokens:
+                        break
+                    overlap.insert(0, (s, t))
+                    overlap_tokens += t
+                current, current_tokens, carried = overlap, overlap_tokens, len(overlap)
+            current.append((sentence, tokens))
+            current_tokens += tokens
+
+        new = current[carried:]
+        if new:
+            new_tokens = sum(t for _, t in new)
+            # Fold a small tail into the previous chunk instead of embedding a fragment
+            if chunks and new_tokens < self.min_tokens:
+                chunks[-1] += " " + " ".join(s for s, _ in new)
+            else:
+                chunks.append(" ".join(s for s, _ in current))
+        return chunks
+
+    def split(self, text: str) -> List[str]:
+        """Chunk text with no page structure (no boilerplate learning)."""
+        return [chunk for chunk in self._pack(text) if self._keep(chunk)]
+
+    def split_page(self, text: str) -> List[str]:
+        """Chunk one page, dropping learned headers/footers and duplicate chunks."""
+        return self.split(self._strip_boilerplate(text))
+
+    def _keep(self, chunk: str) -> bool:
+        if len(chunk.strip()) <= settings.CHUNK_MIN_CHARS:
+            return False
+        if self._is_duplicate(chunk):
+            self.skipped_chunks += 1
+            return False
+        return True
@@ -1,56 +1,133 @@
+import asyncio
 from sqlalchemy.orm import Session
 from ..models.document import Document, DocumentStatus
-from ..parsers.pdf_parser import PDFParser
+from ..parsers.registry import get_parser, iter_document_pages
 from ..services.ai_service import AIService
 from ..services.vector_store import vector_store
+from ..services.summary_tree import SummaryTreeBuilder
+from ..services.page_store import PageStore
+from ..services.processing_tracker import ProcessingTracker
+from ..models.processing import ProcessingStage
 import logging
 
 logger = logging.getLogger(__name__)
 
+# generate_summary only looks at the beginning of the document
+SHORT_SUMMARY_INPUT_CHARS = 4000
+
 class DocumentProcessor:
     @staticmethod
     async def process_document(document_id: int, db: Session):
         """
-        Background task to process a document: extract text and generate summary.
+        Job handler that processes a document: extract text and generate summary.
+        Failures mark the document as ERROR and are re-raised so the job queue can retry.
+        Stage timings and progress are recorded in the document's ProcessingRecord.
         """
         doc = db.query(Document).filter(Document.id == document_id).first()
         if not doc:
             logger.error(f"Document {document_id} not found for processing")
             return
 
+        summary_builder = SummaryTreeBuilder(document_id)
+        indexer = None
+        tracker = None
         try:
             # Update status to processing
             doc.status = DocumentStatus.PROCESSING
             db.commit()
+            tracker = ProcessingTracker(document_id, db)
+
+            # 1. Stream pages through the page store, indexing and the summary tree.
+            # Pages are read lazily and chunks are flushed in bounded batches, so
+            # memory stays flat and the document becomes searchable as it goes.
+            indexer = vector_store.indexer(document_id, doc.user_id)
+            tracker.indexer = indexer
+            summary_input = ""
 
-            # 1. Extract Text
-            # Note: In a real app, we might want to store the extracted text separately or in a vector DB
-            if doc.file_type == "application/pdf":
-                parse_result = PDFParser.extract_text(doc.file_path)
-                text_content = parse_result["text"]
-                pages = parse_result.get("pages", [])
-                doc.page_count = parse_result["page_count"]
+            parser = get_parser(doc.file_type, doc.file_path)
+            if parser is not None:
+                with tracker.timed("parse"):
+                    info = await asyncio.to_thread(parser.read_info, doc.file_path)
+                doc.page_count = info["page_count"]
+                tracker.record.pages_total = doc.page_count
                 
                 # Update metadata if available
-                if parse_result["metadata"] and parse_result["metadata"].author:
-                    doc.author = parse_result["metadata"].author
+                if info["author"]:
+                    doc.author = info["author"]
+                db.commit()
+
+                # Extracted text is persisted so later features never re-parse the file
+                page_writer = PageStore.writer(document_id, db)
+                pages_read = 0
+                # PDFs are extracted in parallel on the parsing process pool; other
+                # formats are streamed section by section from a worker thread
+                pages = iter_document_pages(parser, doc.file_path, doc.page_count)
+                async for page in tracker.pages(pages):
+                    # Only the beginning of the text is needed for the short summary
+                    if len(summary_input) < SHORT_SUMMARY_INPUT_CHARS:
+                        summary_input += page["text"] + "\n"
+                    page_writer.add_page(page)
+                    # Waiting for leaf summaries to drain counts as summarizing
+                    with tracker.timed("summarize"):
+                        await summary_builder.add_page(page)
+                    await indexer.add_page(page)
+                    pages_read += 1
+                page_writer.flush()
+
+                # Formats without pages are counted in sections
+                if doc.page_count is None:
+                    doc.page_count = pages_read
+                    tracker.record.pages_total = pages_read
+                    db.commit()
             else:
-                # Fallback for other formats or implement other parsers
-                text_content = "Contenido de texto no extraíble en esta versión."
-                pages = []
+                # Fallback for formats without a parser
+                summary_input = "Contenido de texto no extraíble en esta versión."
+                await indexer.add_text(summary_input)
 
             # 2. Generate Summary
-            summary = await AIService.generate_summary(text_content)
+            tracker.set_stage(ProcessingStage.SUMMARIZING)
+            with tracker.timed("summarize"):
+                summary = await AIService.generate_summary(summary_input)
             doc.summary_short = summary
+
+            # 3. Finish the hierarchical summary; a failure here shouldn't fail the document
+            try:
+                with tracker.timed("summarize"):
+                    summary_long = await summary_builder.finish(db)
+                if summary_long:
+                    doc.summary_long = summary_long
+            except Exception as e:
+                logger.error(f"Error building summary tree for document {document_id}: {str(e)}")
+                db.rollback()
+                doc.summary_short = summary
             
-            # 3. Index in Vector Store
-            await vector_store.add_document(document_id, text_content, pages=pages)
+            # 4. Flush the remaining chunks to the Vector Store
+            tracker.set_stage(ProcessingStage.INDEXING)
+            await indexer.finish()
             
-            # 4. Complete
+            # 5. Complete
             doc.status = DocumentStatus.COMPLETED
+            tracker.complete()
             db.commit()
             
+        except asyncio.CancelledError:
+            # The job was taken over (or the worker is stopping): discard this
+            # run's partial work but leave the document to whoever runs it next
+            logger.warning(f"Processing of document {document_id} was cancelled")
+            summary_builder.cancel()
+            if indexer:
+                indexer.abort()
+            db.rollback()
+            raise
         except Exception as e:
             logger.error(f"Error processing document {document_id}: {str(e)}")
+            summary_builder.cancel()
+            if indexer:
+                indexer.abort()
+            # Drop whatever the failed step left pending before recording the error
+            db.rollback()
             doc.status = DocumentStatus.ERROR
+            if tracker:
+                tracker.fail(str(e))
             db.commit()
+            raise
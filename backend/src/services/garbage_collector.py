@@ -0,0 +1,159 @@
+import logging
+import time
+from pathlib import Path
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..models.document import Document
+from ..models.chat import ChatMessage
+from ..models.summary import SummaryNode
+from ..models.page import DocumentPage
+from ..models.job import Job
+from ..models.processing import ProcessingRecord
+from ..utils.file_handler import UPLOAD_DIR
+from .vector_store import vector_store
+
+logger = logging.getLogger(__name__)
+
+
+class GarbageCollector:
+    """
+    Finds and removes data left behind by deleted documents: chunks in the
+    vector store, files in storage/documents and rows that reference a
+    document that no longer exists.
+    """
+    # Page size when scanning vector collections
+    SCAN_BATCH = 1000
+
+    @staticmethod
+    def _confirm_orphans(db: Session, candidates, max_live_id: int) -> set:
+        """
+        Candidates that are really orphaned. The id snapshot is taken before a
+        long scan, so ids above its maximum (documents created since) are kept,
+        and the rest are checked against the database again right before deleting.
+        """
+        candidates = sorted({doc_id for doc_id in candidates if isinstance(doc_id, int) and doc_id <= max_live_id})
+        existing = set()
+        for i in range(0, len(candidates), 500):
+            batch = candidates[i:i + 500]
+            existing.update(doc_id for (doc_id,) in db.query(Document.id).filter(Document.id.in_(batch)).all())
+        return set(candidates) - existing
+
+    @staticmethod
+    def _collect_vectors(db: Session, live_ids: set, dry_run: bool) -> dict:
+        freed_chunks = 0
+        orphaned_documents = set()
+        # Chunks without a document_id can't belong to any document; they are deleted by id
+        unattributed = 0
+        max_live_id = max(live_ids, default=0)
+
+        for name in vector_store.list_collection_names():
+            collection = vector_store.get_collection(name)
+            orphans = {}
+            unattributed_ids = []
+            offset = 0
+            while True:
+                batch = collection.get(limit=GarbageCollector.SCAN_BATCH, offset=offset, include=["metadatas"])
+                if not batch["ids"]:
+                    break
+                for chunk_id, metadata in zip(batch["ids"], batch["metadatas"]):
+                    document_id = (metadata or {}).get("document_id")
+                    if document_id is None:
+                        unattributed_ids.append(chunk_id)
+                    elif document_id not in live_ids:
+                        orphans[document_id] = orphans.get(document_id, 0) + 1
+                offset += len(batch["ids"])
+
+            confirmed = GarbageCollector._confirm_orphans(db, orphans, max_live_id)
+            for document_id, count in orphans.items():
+                if document_id not in confirmed:
+                    continue
+                if not dry_run:
+                    collection.delete(where={"document_id": document_id})
+                freed_chunks += count
+                orphaned_documents.add(document_id)
+
+            if not dry_run:
+                for i in range(0, len(unattributed_ids), GarbageCollector.SCAN_BATCH):
+                    collection.delete(ids=unattributed_ids[i:i + GarbageCollector.SCAN_BATCH])
+            freed_chunks += len(unattributed_ids)
+            unattributed += len(unattributed_ids)
+
+        # Memory-mapped per-document indexes (VECTOR_SEARCH_BACKEND="numpy")
+        orphan_indexes = GarbageCollector._confirm_orphans(
+            db, [doc_id for doc_id in vector_store.numpy_index.document_ids() if doc_id not in live_ids], max_live_id
+        )
+        if not dry_run:
+            for document_id in orphan_indexes:
+                vector_store.numpy_index.delete(document_id)
+
+        # BM25 indexes used by chat's hybrid retrieval
+        orphan_lexical = GarbageCollector._confirm_orphans(
+            db, [doc_id for doc_id in vector_store.lexical_index.document_ids() if doc_id not in live_ids], max_live_id
+        )
+        if not dry_run:
+            for document_id in orphan_lexical:
+                vector_store.lexical_index.delete(document_id)
+
+        return {
+            "chunks": freed_chunks,
+            "documents": len(orphaned_documents),
+            "unattributed_chunks": unattributed,
+            "numpy_indexes": len(orphan_indexes),
+            "lexical_indexes": len(orphan_lexical)
+        }
+
+    @staticmethod
+    def _collect_files(referenced: set, dry_run: bool) -> dict:
+        freed_files = 0
+        freed_bytes = 0
+        # Files younger than the grace period may belong to an upload still in progress
+        cutoff = time.time() - settings.GC_FILE_GRACE_SECONDS
+
+        for path in UPLOAD_DIR.iterdir():
+            if not path.is_file() or path.resolve() in referenced:
+                continue
+            stat = path.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            if not dry_run:
+                path.unlink()
+            freed_files += 1
+            freed_bytes += stat.st_size
+
+        return {"files": freed_files, "bytes": freed_bytes}
+
+    @staticmethod
+    def _collect_rows(db: Session, dry_run: bool) -> dict:
+        freed = {}
+        for label, model in (("chat_messages", ChatMessage), ("summary_nodes", SummaryNode), ("document_pages", DocumentPage),
+                             ("jobs", Job), ("processing_records", ProcessingRecord)):
+            query = db.query(model).filter(~model.document_id.in_(select(Document.id)))
+            freed[label] = query.count()
+            if not dry_run and freed[label]:
+                query.delete(synchronize_session=False)
+        if not dry_run:
+            db.commit()
+        return freed
+
+    @staticmethod
+    def collect(db: Session, dry_run: bool = False) -> dict:
+        """
+        Run a full collection pass and report what was (or, with dry_run,
+        would be) freed.
+        """
+        started_at = time.perf_counter()
+        documents = db.query(Document.id, Document.file_path).all()
+        live_ids = {doc_id for doc_id, _ in documents}
+        referenced = {Path(file_path).resolve() for _, file_path in documents if file_path}
+
+        report = {
+            "dry_run": dry_run,
+            "vectors": GarbageCollector._collect_vectors(db, live_ids, dry_run),
+            "files": GarbageCollector._collect_files(referenced, dry_run),
+            "rows": GarbageCollector._collect_rows(db, dry_run),
+        }
+        report["duration_seconds"] = round(time.perf_counter() - started_at, 3)
+
+        logger.info(f"Storage GC report: {report}")
+        return report
@@ -0,0 +1,196 @@
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..models.document import Document, DocumentStatus
+from ..models.job import Job, JobStatus
+
+PROCESS_DOCUMENT = "process_document"
+
+# Fresh uploads go ahead of reprocessing requests
+PRIORITY_UPLOAD = 10
+PRIORITY_REPROCESS = 0
+
+
+class JobQueue:
+    """
+    Durable job queue on the application database. Workers claim jobs with a
+    conditional UPDATE, so exactly one worker wins each job on both SQLite and
+    Postgres. A claimed job stays invisible until its lock expires; workers
+    extend the lock while they run, so a job whose worker died is picked up
+    again once JOB_VISIBILITY_TIMEOUT_SECONDS pass, unless it has used all its
+    attempts. Outcomes are only recorded by the worker that holds the lock.
+    """
+    @staticmethod
+    def enqueue(db: Session, kind: str, document_id: Optional[int] = None, priority: int = 0) -> Job:
+        job = Job(
+            kind=kind,
+            document_id=document_id,
+            status=JobStatus.QUEUED,
+            priority=priority,
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+            available_at=time.time()
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    @staticmethod
+    def has_pending(db: Session, kind: str, document_id: int) -> bool:
+        """Whether the document already has a queued or running job of this kind."""
+        return db.query(Job.id).filter(
+            Job.kind == kind,
+            Job.document_id == document_id,
+            Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+        ).first() is not None
+
+    @staticmethod
+    def _claimable(now: float):
+        return or_(
+            and_(Job.status == JobStatus.QUEUED, Job.available_at <= now),
+            and_(Job.status == JobStatus.RUNNING, Job.locked_until < now, Job.attempts < Job.max_attempts)
+        )
+
+    @staticmethod
+    def _fail_exhausted(db: Session, now: float) -> None:
+        """
+        Fail jobs whose worker was lost (crashed, killed, hung) on their last
+        attempt, instead of leasing them again forever.
+        """
+        exhausted = db.query(Job.id, Job.kind, Job.document_id).filter(
+            Job.status == JobStatus.RUNNING,
+            Job.locked_until < now,
+            Job.attempts >= Job.max_attempts
+        ).all()
+        for job_id, kind, document_id in exhausted:
+            result = db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == JobStatus.RUNNING, Job.locked_until < now)
+                .values(
+                    status=JobStatus.FAILED,
+                    locked_by=None,
+                    locked_until=None,
+                    last_error="Worker lost the job on its last attempt (lock expired)",
+                    finished_at=datetime.now(timezone.utc)
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1 and kind == PROCESS_DOCUMENT and document_id is not None:
+                db.execute(
+                    update(Document)
+                    .where(Document.id == document_id, Document.status == DocumentStatus.PROCESSING)
+                    .values(status=DocumentStatus.ERROR)
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+
+    @staticmethod
+    def claim(db: Session, worker_id: str) -> Optional[Job]:
+        """Claim the highest-priority available job, or return None."""
+        JobQueue._fail_exhausted(db, time.time())
+        # A few candidates, so a lost race doesn't leave the worker idle until the next poll
+        for _ in range(5):
+            now = time.time()
+            candidate = (
+                db.query(Job.id)
+                .filter(JobQueue._claimable(now))
+                .order_by(Job.priority.desc(), Job.id)
+                .first()
+            )
+            if candidate is None:
+                return None
+
+            result = db.execute(
+                update(Job)
+                .where(Job.id == candidate.id, JobQueue._claimable(now))
+                .values(
+                    status=JobStatus.RUNNING,
+                    locked_by=worker_id,
+                    locked_until=now + settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+                    attempts=Job.attempts + 1,
+                    started_at=datetime.now(timezone.utc)
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            if result.rowcount == 1:
+                return db.query(Job).filter(Job.id == candidate.id).first()
+        return None
+
+    @staticmethod
+    def heartbeat(db: Session, job_id: int, worker_id: str) -> bool:
+        """Extend the job's lock. False if another worker has taken it over."""
+        result = db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.locked_by == worker_id, Job.status == JobStatus.RUNNING)
+            .values(locked_until=time.time() + settings.JOB_VISIBILITY_TIMEOUT_SECONDS)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    def _record(db: Session, job_id: int, worker_id: str, **values) -> bool:
+        """Apply an outcome only if worker_id still holds the job's lock."""
+        result = db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.locked_by == worker_id, Job.status == JobStatus.RUNNING)
+            .values(locked_by=None, locked_until=None, **values)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    def complete(db: Session, job_id: int, worker_id: str) -> bool:
+        """Mark the job succeeded. False if another worker has taken it over."""
+        return JobQueue._record(
+            db, job_id, worker_id,
+            status=JobStatus.SUCCEEDED,
+            last_error=None,
+            finished_at=datetime.now(timezone.utc)
+        )
+
+    @staticmethod
+    def fail(db: Session, job_id: int, worker_id: str, error: str) -> bool:
+        """
+        Schedule a retry with exponential backoff, or mark the job failed for
+        good. False if another worker has taken it over.
+        """
+        job = db.query(Job.attempts, Job.max_attempts).filter(Job.id == job_id).first()
+        if job is None:
+            return False
+        if job.attempts < job.max_attempts:
+            return JobQueue._record(
+                db, job_id, worker_id,
+                status=JobStatus.QUEUED,
+                last_error=error,
+                available_at=time.time() + settings.JOB_RETRY_BASE_DELAY_SECONDS * 2 ** (job.attempts - 1)
+            )
+        return JobQueue._record(
+            db, job_id, worker_id,
+            status=JobStatus.FAILED,
+            last_error=error,
+            finished_at=datetime.now(timezone.utc)
+        )
+
+    @staticmethod
+    def stats(db: Session) -> dict:
+        """Queue depth by status and the age of the oldest waiting job."""
+        counts = dict(db.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+        now = time.time()
+        oldest = (
+            db.query(func.min(Job.available_at))
+            .filter(Job.status == JobStatus.QUEUED, Job.available_at <= now)
+            .scalar()
+        )
+        return {
+            "queued": counts.get(JobStatus.QUEUED.value, 0),
+            "running": counts.get(JobStatus.RUNNING.value, 0),
+            "succeeded": counts.get(JobStatus.SUCCEEDED.value, 0),
+            "failed": counts.get(JobStatus.FAILED.value, 0),
+            "oldest_queued_age_seconds": round(now - oldest, 1) if oldest else 0.0,
+        }
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Optional
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..db.connection import SessionLocal
+from ..models.job import Job
+from .job_queue import JobQueue, PROCESS_DOCUMENT
+from .document_processor import DocumentProcessor
+
+logger = logging.getLogger(__name__)
+
+# Tries at recording a job's outcome (e.g. while SQLite is locked by another job)
+FINISH_ATTEMPTS = 5
+
+
+async def _process_document(job: Job, db: Session) -> None:
+    await DocumentProcessor.process_document(job.document_id, db)
+
+
+# Job kind -> async handler(job, db)
+HANDLERS = {
+    PROCESS_DOCUMENT: _process_document,
+}
+
+
+class JobWorker:
+    """
+    Runs queued jobs with at most `concurrency` in flight. Every job gets its
+    own database session; while it runs, a separate session keeps extending
+    its lock so other workers don't reclaim it.
+    """
+    def __init__(self, concurrency: int = None):
+        self.concurrency = max(1, concurrency or settings.JOB_CONCURRENCY)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._stopping = None
+
+    def stop(self) -> None:
+        """Stop claiming new jobs; running jobs are allowed to finish."""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def _heartbeat(self, job_id: int, slot_id: str, handler: asyncio.Task) -> bool:
+        """
+        Extend the job's lock until cancelled. If another worker has taken the
+        job over, cancel the handler so two workers never run it side by side,
+        and return True.
+        """
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+            db = SessionLocal()
+            try:
+                if not JobQueue.heartbeat(db, job_id, slot_id):
+                    logger.warning(f"Lost the lock on job {job_id}; abandoning it")
+                    handler.cancel()
+                    return True
+            except Exception as e:
+                logger.error(f"Heartbeat for job {job_id} failed: {str(e)}")
+            finally:
+                db.close()
+
+    async def _finish(self, job_id: int, slot_id: str, error: Optional[str] = None) -> None:
+        """
+        Mark the job succeeded, or failed with `error`, in a fresh session: the
+        job's own session may be unusable after a failure. Nothing is recorded
+        if another worker has taken the job over. Lock errors are retried; if
+        all tries fail the job is picked up again once its lock expires.
+        """
+        for attempt in range(FINISH_ATTEMPTS):
+            db = SessionLocal()
+            try:
+                if error is None:
+                    recorded = JobQueue.complete(db, job_id, slot_id)
+                else:
+                    recorded = JobQueue.fail(db, job_id, slot_id, error)
+                if not recorded:
+                    logger.warning(f"Job {job_id} is no longer held by {slot_id}; outcome discarded")
+                return
+            except OperationalError as e:
+                db.rollback()
+                logger.warning(f"Could not record the outcome of job {job_id} (try {attempt + 1}): {str(e)}")
+                await asyncio.sleep(2 ** attempt)
+            finally:
+                db.close()
+        logger.error(f"Gave up recording the outcome of job {job_id}; it will run again after its lock expires")
+
+    async def _execute(self, db: Session, job: Job, slot_id: str) -> None:
+        # Plain values: the job object is bound to a session that may fail
+        job_id, kind, attempts = job.id, job.kind, job.attempts
+        handler = HANDLERS.get(kind)
+        if handler is None:
+            await self._finish(job_id, slot_id, f"Unknown job kind: {kind}")
+            return
+
+        task = asyncio.ensure_future(handler(job, db))
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, slot_id, task))
+        error = None
+        try:
+            await task
+        except asyncio.CancelledError:
+            lease_lost = heartbeat.done() and not heartbeat.cancelled() and heartbeat.result()
+            if not lease_lost:
+                raise
+            # The new owner records the outcome
+            return
+        except Exception as e:
+            logger.error(f"Job {job_id} ({kind}) failed on attempt {attempts}: {str(e)}")
+            error = str(e)
+        finally:
+            heartbeat.cancel()
+            # Don't keep a transaction (and SQLite's write lock) open past the handler
+            db.rollback()
+        await self._finish(job_id, slot_id, error)
+
+    async def _slot(self, slot: int) -> None:
+        slot_id = f"{self.worker_id}/{slot}"
+        while not self._stopping.is_set():
+            db = SessionLocal()
+            try:
+                job = JobQueue.claim(db, slot_id)
+                if job is not None:
+                    await self._execute(db, job, slot_id)
+                    continue
+            except Exception as e:
+                logger.error(f"Job worker slot {slot_id} error: {str(e)}")
+            finally:
+                db.close()
+
+            # Nothing to do: wait for the next poll (or for shutdown)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=settings.JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self) -> None:
+        self._stopping = asyncio.Event()
+        logger.info(f"Job worker {self.worker_id} started with {self.concurrency} slots")
+        await asyncio.gather(*(self._slot(slot) for slot in range(self.concurrency)))
+        logger.info(f"Job worker {self.worker_id} stopped")
@@ -0,0 +1,259 @@
+import gzip
+import json
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+import uuid
+import zlib
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+# Words that carry no retrieval signal in the questions users ask (Spanish and English)
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aqui asi aunque cada como con contra cual cuales cuando
+de del desde donde dos el ella ellas ellos en entre era eran es esa esas ese eso esos esta estan estas este esto estos
+fue fueron ha hay la las le les lo los mas me mi mis muy no nos o otra otras otro otros para pero por porque puede que
+quien se sea ser si sin sobre son su sus tambien te tiene tienen todo todos tu un una unas uno unos y ya
+an and are as at be by for from has have how in is it its of on or that the this to was what when where which who why with
+""".split())
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+logger = logging.getLogger(__name__)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, accent-insensitive word tokens without stopwords."""
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return [t for t in TOKEN_PATTERN.findall(folded) if len(t) > 1 and t not in STOPWORDS]
+
+
+class LexicalIndexWriter:
+    """
+    Builds one document's BM25 index as chunks arrive. Postings (small ints)
+    stay in memory; chunk texts are streamed to a temporary file so memory
+    stays bounded for large documents. Nothing is visible until finish().
+    Both files carry the same generation token, so a reader never pairs the
+    postings of one build with the texts of another, and the temporary files
+    are named after it so concurrent builds of a document never share one.
+    """
+    def __init__(self, index: "LexicalIndex", document_id: int):
+        self.index = index
+        self.document_id = document_id
+        self._postings = {}
+        self._lengths = []
+        self._pages = []
+        self._generation = uuid.uuid4().hex
+        self._texts_tmp = index.path(document_id, f"texts.gz.{self._generation}.tmp")
+        self._texts = gzip.open(self._texts_tmp, "wt", encoding="utf-8")
+        self._texts.write(json.dumps(self._generation) + "\n")
+
+    def add(self, text: str, page_number: int) -> None:
+        chunk = len(self._lengths)
+        terms = tokenize(text)
+        for term, tf in Counter(terms).items():
+            self._postings.setdefault(term, []).append((chunk, tf))
+        self._lengths.append(len(terms))
+        self._pages.append(page_number)
+        self._texts.write(json.dumps(text, ensure_ascii=False) + "\n")
+
+    def finish(self) -> None:
+        self._texts.close()
+        if not self._lengths:
+            self.abort()
+            return
+
+        # Chunk ids are stored delta-encoded, next to their term frequencies
+        postings = {}
+        for term, entries in self._postings.items():
+            previous = 0
+            deltas = []
+            for chunk, _ in entries:
+                deltas.append(chunk - previous)
+                previous = chunk
+            postings[term] = [deltas, [tf for _, tf in entries]]
+
+        index_tmp = self.index.path(self.document_id, f"json.gz.{self._generation}.tmp")
+        with gzip.open(index_tmp, "wt", encoding="utf-8") as f:
+            json.dump({
+                "generation": self._generation,
+                "lengths": self._lengths,
+                "pages": self._pages,
+                "postings": postings
+            }, f, separators=(",", ":"))
+
+        os.replace(self._texts_tmp, self.index.path(self.document_id, "texts.gz"))
+        os.replace(index_tmp, self.index.path(self.document_id, "json.gz"))
+        self.index.forget(self.document_id)
+
+    def abort(self) -> None:
+        self._texts.close()
+        if os.path.exists(self._texts_tmp):
+            os.remove(self._texts_tmp)
+
+
+class LexicalIndex:
+    """
+    Per-document BM25 inverted indexes stored as gzip files under
+    storage/lexical. Recently used indexes are kept loaded in memory and
+    reloaded when the file changes, e.g. after another process re-indexed
+    the document.
+    """
+    k1 = 1.2
+    b = 0.75
+    # Loaded indexes kept per worker
+    max_loaded = 32
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._loaded = OrderedDict()
+        # Searches run on the vector store's read threads
+        self._lock = threading.Lock()
+
+    def path(self, document_id: int, suffix: str) -> str:
+        return str(self.directory / f"{document_id}.lex.{suffix}")
+
+    def writer(self, document_id: int) -> LexicalIndexWriter:
+        return LexicalIndexWriter(self, document_id)
+
+    def forget(self, document_id: int) -> None:
+        with self._lock:
+            self._loaded.pop(document_id, None)
+
+    @staticmethod
+    def _signature(path: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self, document_id: int) -> Optional[dict]:
+        """
+        Read a published index, retrying if a re-index replaces it mid-read.
+        An unreadable index is treated as missing.
+        """
+        for _ in range(3):
+            signature = self._signature(self.path(document_id, "json.gz"))
+            if signature is None:
+                return None
+            try:
+                with gzip.open(self.path(document_id, "json.gz"), "rt", encoding="utf-8") as f:
+                    data = json.load(f)
+                with gzip.open(self.path(document_id, "texts.gz"), "rt", encoding="utf-8") as f:
+                    lines = [json.loads(line) for line in f]
+            except FileNotFoundError:
+                continue
+            except (OSError, EOFError, ValueError, zlib.error) as e:
+                logger.warning(f"Unreadable lexical index for document {document_id}: {e}")
+                return None
+            # Indexes written before generations were recorded have none
+            if "generation" not in data:
+                data["texts"] = lines
+            elif lines and lines[0] == data["generation"]:
+                data["texts"] = lines[1:]
+            else:
+                continue
+            data["signature"] = signature
+            return data
+        return None
+
+    def _load(self, document_id: int) -> Optional[dict]:
+        signature = self._signature(self.path(document_id, "json.gz"))
+        if signature is None:
+            self.forget(document_id)
+            return None
+        with self._lock:
+            data = self._loaded.get(document_id)
+            if data is not None and data["signature"] == signature:
+                self._loaded.move_to_end(document_id)
+                return data
+
+        data = self._read(document_id)
+        if data is None:
+            return None
+
+        postings = {}
+        for term, (deltas, tfs) in data["postings"].items():
+            chunk = 0
+            entries = []
+            for delta, tf in zip(deltas, tfs):
+                chunk += delta
+                entries.append((chunk, tf))
+            postings[term] = entries
+        data["postings"] = postings
+        data["avgdl"] = sum(data["lengths"]) / len(data["lengths"]) or 1.0
+
+        with self._lock:
+            self._loaded[document_id] = data
+            if len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return data
+
+    def search(self, document_id: int, query: str, limit: int = 3) -> Optional[dict]:
+        """
+        BM25 search over one document. Returns None if the document has no
+        lexical index, otherwise {"results", "coverage", "confidence"}:
+        - results: {"text", "metadata", "score"} dicts, best first
+        - coverage: fraction of the query terms found in the top result
+        - confidence: top score relative to one occurrence of every matched
+          query term in an average-length chunk (about 1.0 for a plain match)
+        """
+        data = self._load(document_id)
+        if data is None:
+            return None
+
+        terms = list(dict.fromkeys(tokenize(query)))
+        n = len(data["lengths"])
+        scores = {}
+        matched = {}
+        reference = 0.0
+        for term in terms:
+            entries = data["postings"].get(term)
+            if not entries:
+                continue
+            idf = math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            # What one occurrence in an average-length chunk would score
+            reference += idf
+            for chunk, tf in entries:
+                norm = self.k1 * (1 - self.b + self.b * data["lengths"][chunk] / data["avgdl"])
+                scores[chunk] = scores.get(chunk, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                matched.setdefault(chunk, set()).add(term)
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        results = []
+        for chunk, score in ranked:
+            text = data["texts"][chunk]
+            results.append({
+                "text": text,
+                "metadata": {"document_id": document_id, "page_number": data["pages"][chunk], "text": text},
+                "score": score
+            })
+
+        return {
+            "results": results,
+            "coverage": len(matched[ranked[0][0]]) / len(terms) if ranked else 0.0,
+            "confidence": ranked[0][1] / reference if ranked else 0.0
+        }
+
+    def delete(self, document_id: int) -> None:
+        self.forget(document_id)
+        for suffix in ("json.gz", "texts.gz"):
+            path = self.path(document_id, suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def document_ids(self) -> List[int]:
+        """Ids of every document with a published index."""
+        ids = []
+        for path in self.directory.glob("*.lex.json.gz"):
+            prefix = path.name.split(".", 1)[0]
+            if prefix.isdigit():
+                ids.append(int(prefix))
+        return ids
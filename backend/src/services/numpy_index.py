@@ -0,0 +1,210 @@
+import os
+import uuid
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+
+# Per-chunk row of the offset table: where its text lives in the .texts.bin file
+CHUNK_DTYPE = np.dtype([("offset", "<i8"), ("length", "<i4"), ("page", "<i4")])
+
+# Rows scored per step, so huge documents never materialise a full float32 copy
+SCORE_BLOCK = 65536
+
+
+class NumpyIndexWriter:
+    """
+    Builds one document's index incrementally. Rows are appended to temporary
+    files as batches arrive and only become visible on finish(). Every build
+    is a new generation of three files:
+    - {id}.{generation}.vectors.npy: (n, dim) unit-normalised float32, or int8 scaled by 127
+    - {id}.{generation}.chunks.npy: offset table (CHUNK_DTYPE) into the texts file
+    - {id}.{generation}.texts.bin: concatenated UTF-8 chunk texts
+    The {id}.current pointer file names the live generation and is replaced
+    atomically, so a search always reads three files of the same build.
+    """
+    def __init__(self, index: "NumpyIndex", document_id: int):
+        self.index = index
+        self.document_id = document_id
+        self.generation = uuid.uuid4().hex[:12]
+        self.count = 0
+        self.dim = None
+        self._raw_path = index.path(document_id, f"{self.generation}.vectors.f32.tmp")
+        self._texts_path = index.path(document_id, f"{self.generation}.texts.bin")
+        self._raw = open(self._raw_path, "wb")
+        self._texts = open(self._texts_path, "wb")
+        self._text_offset = 0
+        self._chunks = []
+
+    def add(self, embeddings: List[List[float]], texts: List[str], pages: List[int]) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        self._raw.write(vectors.tobytes())
+
+        for text, page in zip(texts, pages):
+            data = text.encode("utf-8")
+            self._texts.write(data)
+            self._chunks.append((self._text_offset, len(data), page))
+            self._text_offset += len(data)
+        self.count += len(texts)
+
+    def finish(self) -> None:
+        self._raw.close()
+        self._texts.close()
+        if not self.count:
+            self.abort()
+            return
+
+        vectors_path = self.index.path(self.document_id, f"{self.generation}.vectors.npy")
+        chunks_path = self.index.path(self.document_id, f"{self.generation}.chunks.npy")
+
+        raw = np.memmap(self._raw_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        out = np.lib.format.open_memmap(vectors_path, mode="w+", dtype=self.index.dtype, shape=(self.count, self.dim))
+        for start in range(0, self.count, SCORE_BLOCK):
+            block = raw[start:start + SCORE_BLOCK]
+            if self.index.dtype == np.int8:
+                block = np.clip(np.rint(block * 127), -127, 127)
+            out[start:start + SCORE_BLOCK] = block
+        out.flush()
+        del out, raw
+
+        np.save(chunks_path, np.array(self._chunks, dtype=CHUNK_DTYPE))
+        os.remove(self._raw_path)
+        self.index.publish(self.document_id, self.generation)
+
+    def abort(self) -> None:
+        for handle in (self._raw, self._texts):
+            handle.close()
+        self.index.remove_generation(self.document_id, self.generation)
+        if os.path.exists(self._raw_path):
+            os.remove(self._raw_path)
+
+
+class NumpyIndex:
+    """
+    Exact per-document vector search over memory-mapped .npy files. For the
+    few hundred to few thousand chunks of one document, a vectorised dot
+    product plus top-k is faster and more predictable than a filtered HNSW query.
+    """
+    def __init__(self, directory: str, dtype: str = "float32"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dtype = np.int8 if dtype == "int8" else np.float32
+
+    def path(self, document_id: int, suffix: str) -> str:
+        return str(self.directory / f"{document_id}.{suffix}")
+
+    def writer(self, document_id: int) -> NumpyIndexWriter:
+        return NumpyIndexWriter(self, document_id)
+
+    def _files(self, document_id: int, generation: Optional[str]) -> dict:
+        # Indexes published before generations existed have no generation in their names
+        prefix = f"{generation}." if generation else ""
+        return {name: self.path(document_id, prefix + name) for name in ("vectors.npy", "chunks.npy", "texts.bin")}
+
+    def current(self, document_id: int) -> Optional[str]:
+        """Live generation of a document's index, "" for the legacy layout, None if there is none."""
+        try:
+            with open(self.path(document_id, "current"), encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return "" if os.path.exists(self.path(document_id, "vectors.npy")) else None
+
+    def publish(self, document_id: int, generation: str) -> None:
+        """Switch the document to a fully written generation and drop the previous one."""
+        previous = self.current(document_id)
+        pointer_tmp = self.path(document_id, "current.tmp")
+        with open(pointer_tmp, "w", encoding="utf-8") as f:
+            f.write(generation)
+        os.replace(pointer_tmp, self.path(document_id, "current"))
+        if previous is not None and previous != generation:
+            self.remove_generation(document_id, previous)
+
+    def remove_generation(self, document_id: int, generation: str) -> None:
+        for path in self._files(document_id, generation).values():
+            if os.path.exists(path):
+                os.remove(path)
+
+    def exists(self, document_id: int) -> bool:
+        return self.current(document_id) is not None
+
+    def _open(self, document_id: int) -> Optional[tuple]:
+        """Open the live generation; retried if a publish replaces it in between."""
+        for _ in range(3):
+            generation = self.current(document_id)
+            if generation is None:
+                return None
+            files = self._files(document_id, generation)
+            try:
+                vectors = np.load(files["vectors.npy"], mmap_mode="r")
+                chunks = np.load(files["chunks.npy"], mmap_mode="r")
+                texts = open(files["texts.bin"], "rb")
+            except FileNotFoundError:
+                continue
+            return vectors, chunks, texts
+        return None
+
+    def search(self, document_id: int, query_embedding: List[float], limit: int = 3) -> Optional[List[dict]]:
+        """
+        Returns the top chunks as {"text", "metadata", "score"} dicts, or None
+        if the document has no index.
+        """
+        opened = self._open(document_id)
+        if opened is None:
+            return None
+        vectors, chunks, texts = opened
+        with texts:
+            return self._search(document_id, vectors, chunks, texts, query_embedding, limit)
+
+    def _search(self, document_id: int, vectors, chunks, texts, query_embedding: List[float], limit: int) -> List[dict]:
+        if not len(vectors):
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query /= norm
+
+        scores = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), SCORE_BLOCK):
+            block = vectors[start:start + SCORE_BLOCK]
+            scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+        if vectors.dtype == np.int8:
+            scores /= 127
+
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        output = []
+        for row in top:
+            offset, length, page = chunks[row]
+            texts.seek(int(offset))
+            text = texts.read(int(length)).decode("utf-8")
+            output.append({
+                "text": text,
+                "metadata": {"document_id": document_id, "page_number": int(page), "text": text},
+                "score": float(scores[row])
+            })
+        return output
+
+    def delete(self, document_id: int) -> None:
+        """Remove every generation of the document's index."""
+        pointer = self.path(document_id, "current")
+        if os.path.exists(pointer):
+            os.remove(pointer)
+        for path in self.directory.glob(f"{document_id}.*"):
+            if path.name.endswith((".vectors.npy", ".chunks.npy", ".texts.bin")):
+                path.unlink(missing_ok=True)
+
+    def document_ids(self) -> List[int]:
+        """Ids of every document with a published index."""
+        ids = set()
+        for pattern in ("*.current", "*.vectors.npy"):
+            for path in self.directory.glob(pattern):
+                prefix = path.name.split(".", 1)[0]
+                if prefix.isdigit():
+                    ids.add(int(prefix))
+        return sorted(ids)
@@ -0,0 +1,104 @@
+import asyncio
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..db.connection import SessionLocal
+from ..models.document import Document, DocumentStatus
+from ..models.page import DocumentPage
+from ..parsers.registry import get_parser
+
+# Pages held in the session before they are flushed to the database
+WRITE_BATCH = 50
+
+
+class PageWriter:
+    """
+    Persists a document's pages as ingestion reads them, replacing any pages
+    stored by a previous run. Rows are committed in batches, so the
+    database is never left locked while the next pages are parsed.
+    """
+    def __init__(self, document_id: int, db: Session):
+        self.document_id = document_id
+        self.db = db
+        self._pending = 0
+        db.query(DocumentPage).filter(DocumentPage.document_id == document_id).delete()
+        db.commit()
+
+    def add_page(self, page: dict) -> None:
+        self.db.add(DocumentPage(
+            document_id=self.document_id,
+            page_number=page["page_number"],
+            text=page["text"] or ""
+        ))
+        self._pending += 1
+        if self._pending >= WRITE_BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            self.db.commit()
+            self._pending = 0
+
+
+class PageStore:
+    @staticmethod
+    def writer(document_id: int, db: Session) -> PageWriter:
+        return PageWriter(document_id, db)
+
+    @staticmethod
+    def get_text(db: Session, document_id: int, start_page: int = 1, end_page: Optional[int] = None,
+                 max_chars: Optional[int] = None) -> Optional[str]:
+        """
+        Text of pages start_page..end_page, with a line break after each page.
+        Reading stops once max_chars are collected. Returns None if no pages
+        are stored for the document.
+        """
+        query = db.query(DocumentPage.text).filter(
+            DocumentPage.document_id == document_id,
+            DocumentPage.page_number >= start_page
+        )
+        if end_page is not None:
+            query = query.filter(DocumentPage.page_number <= end_page)
+
+        texts = []
+        length = 0
+        for (text,) in query.order_by(DocumentPage.page_number).yield_per(WRITE_BATCH):
+            texts.append(text)
+            length += len(text) + 1
+            if max_chars is not None and length >= max_chars:
+                break
+        if not texts:
+            return None
+
+        text = "\n".join(texts) + "\n"
+        return text[:max_chars] if max_chars is not None else text
+
+    @staticmethod
+    def _backfill(document_id: int, parser, file_path: str) -> None:
+        """Parse a file and store its pages (blocking; uses its own session)."""
+        db = SessionLocal()
+        try:
+            writer = PageStore.writer(document_id, db)
+            for page in parser.iter_pages(file_path):
+                writer.add_page(page)
+            writer.flush()
+        except IntegrityError:
+            # Another request backfilled the same document concurrently
+            db.rollback()
+        finally:
+            db.close()
+
+    @staticmethod
+    async def get_document_text(db: Session, doc: Document, max_chars: Optional[int] = None) -> Optional[str]:
+        """
+        Stored text of a document. Completed documents processed before pages
+        were persisted are parsed once, off the event loop, and backfilled.
+        Returns None if no text is available.
+        """
+        text = PageStore.get_text(db, doc.id, max_chars=max_chars)
+        parser = get_parser(doc.file_type, doc.file_path)
+        # While a document is being ingested its pages are written by the job only
+        if text is None and parser is not None and doc.status == DocumentStatus.COMPLETED:
+            await asyncio.to_thread(PageStore._backfill, doc.id, parser, doc.file_path)
+            text = PageStore.get_text(db, doc.id, max_chars=max_chars)
+        return text
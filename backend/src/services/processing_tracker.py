@@ -0,0 +1,89 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+from sqlalchemy.orm import Session
+from ..models.processing import ProcessingRecord, ProcessingStage
+
+# Progress is written at most this often while pages stream, plus at every stage change
+SAVE_INTERVAL_SECONDS = 2.0
+
+
+class ProcessingTracker:
+    """
+    Records the timing and progress of one ingestion run in the document's
+    ProcessingRecord, replacing the record of any previous run. Chunk, embed
+    and upsert times come from the DocumentIndexer; parse and summarize
+    times are measured here.
+    """
+    def __init__(self, document_id: int, db: Session):
+        self.db = db
+        self.indexer = None
+        self.timings = {"parse": 0.0, "summarize": 0.0}
+        self._started = time.perf_counter()
+        self._saved = self._started
+
+        db.query(ProcessingRecord).filter(ProcessingRecord.document_id == document_id).delete()
+        self.record = ProcessingRecord(document_id=document_id, stage=ProcessingStage.READING)
+        db.add(self.record)
+        db.commit()
+
+    @contextmanager
+    def timed(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] += time.perf_counter() - start
+
+    async def pages(self, pages: AsyncIterator[dict]) -> AsyncIterator[dict]:
+        """Pass pages through, counting the time spent waiting for the parser as parse time."""
+        iterator = pages.__aiter__()
+        while True:
+            with self.timed("parse"):
+                try:
+                    page = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield page
+            self.record.pages_done += 1
+            self.save()
+
+    def set_stage(self, stage: ProcessingStage) -> None:
+        self.record.stage = stage
+        self.save(force=True)
+
+    def save(self, force: bool = False) -> None:
+        """Copy the counters into the record and commit, at most every SAVE_INTERVAL_SECONDS unless forced."""
+        now = time.perf_counter()
+        if not force and now - self._saved < SAVE_INTERVAL_SECONDS:
+            return
+        self._saved = now
+
+        record = self.record
+        record.parse_seconds = round(self.timings["parse"], 3)
+        record.summarize_seconds = round(self.timings["summarize"], 3)
+        if self.indexer is not None:
+            record.chunk_seconds = round(self.indexer.timings["chunk"], 3)
+            record.embed_seconds = round(self.indexer.timings["embed"], 3)
+            record.upsert_seconds = round(self.indexer.timings["upsert"], 3)
+            record.chunks_indexed = self.indexer.indexed
+            record.chunks_embedded = self.indexer.embedded
+            record.chunks_skipped = self.indexer.chunker.skipped_chunks
+        record.total_seconds = round(now - self._started, 3)
+        self.db.commit()
+
+    def complete(self) -> None:
+        self.record.stage = ProcessingStage.COMPLETED
+        self.record.finished_at = datetime.now(timezone.utc)
+        self.save(force=True)
+
+    def fail(self, error: str) -> None:
+        """Mark the run failed, keeping the stage it failed in."""
+        self.record.error = error
+        self.record.finished_at = datetime.now(timezone.utc)
+        self.save(force=True)
+
+    @staticmethod
+    def get(db: Session, document_id: int) -> Optional[ProcessingRecord]:
+        return db.query(ProcessingRecord).filter(ProcessingRecord.document_id == document_id).first()
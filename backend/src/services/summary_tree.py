@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..models.summary import SummaryNode
+from .ai_service import AIService
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryTreeBuilder:
+    """
+    Builds a document's summary tree (map-reduce) from pages fed one at a time.
+    Consecutive pages are grouped into leaves of at most SUMMARY_LEAF_CHARS,
+    leaves are summarised in parallel with bounded concurrency, and groups of
+    SUMMARY_FAN_IN nodes are reduced level by level up to a single root.
+    """
+    def __init__(self, document_id: int):
+        self.document_id = document_id
+        self._semaphore = asyncio.Semaphore(settings.SUMMARY_CONCURRENCY)
+        self._group: List[dict] = []
+        self._group_chars = 0
+        self._leaves: List[asyncio.Task] = []
+
+    async def add_page(self, page: dict) -> None:
+        text_length = len(page["text"].strip())
+        if self._group and self._group_chars + text_length > settings.SUMMARY_LEAF_CHARS:
+            await self._flush_leaf()
+        self._group.append(page)
+        self._group_chars += text_length
+
+    async def _flush_leaf(self) -> None:
+        pages, self._group, self._group_chars = self._group, [], 0
+        text = "\n".join(page["text"] for page in pages).strip()
+        if not text:
+            return
+
+        # Don't let queued leaves (and their text) pile up ahead of the AI calls
+        pending = [task for task in self._leaves if not task.done()]
+        if len(pending) >= 2 * settings.SUMMARY_CONCURRENCY:
+            await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+        self._leaves.append(asyncio.create_task(self._summarize_leaf(
+            pages[0]["page_number"],
+            pages[-1]["page_number"],
+            text[:settings.SUMMARY_LEAF_CHARS]
+        )))
+
+    async def _summarize_leaf(self, page_start: int, page_end: int, text: str) -> dict:
+        async with self._semaphore:
+            content = await AIService.summarize_section(text)
+        return {"page_start": page_start, "page_end": page_end, "content": content}
+
+    async def _reduce(self, group: List[dict]) -> dict:
+        if len(group) == 1:
+            return dict(group[0])
+        async with self._semaphore:
+            content = await AIService.combine_summaries([node["content"] for node in group])
+        return {"page_start": group[0]["page_start"], "page_end": group[-1]["page_end"], "content": content}
+
+    def cancel(self) -> None:
+        """Abandon any leaf summaries still in flight."""
+        for task in self._leaves:
+            task.cancel()
+
+    async def finish(self, db: Session) -> Optional[str]:
+        """
+        Wait for all leaves, reduce them to a root, persist the tree (replacing
+        any previous one) and return the root summary.
+        """
+        if self._group:
+            await self._flush_leaf()
+        if not self._leaves:
+            return None
+
+        try:
+            level_nodes = list(await asyncio.gather(*self._leaves))
+        except Exception:
+            self.cancel()
+            raise
+
+        levels = [level_nodes]
+        fan_in = max(2, settings.SUMMARY_FAN_IN)
+        while len(level_nodes) > 1:
+            groups = [level_nodes[i:i + fan_in] for i in range(0, len(level_nodes), fan_in)]
+            level_nodes = list(await asyncio.gather(*(self._reduce(group) for group in groups)))
+            levels.append(level_nodes)
+
+        db.query(SummaryNode).filter(SummaryNode.document_id == self.document_id).delete()
+        for level, nodes in enumerate(levels):
+            for position, node in enumerate(nodes):
+                db.add(SummaryNode(
+                    document_id=self.document_id,
+                    level=level,
+                    position=position,
+                    page_start=node["page_start"],
+                    page_end=node["page_end"],
+                    content=node["content"]
+                ))
+        db.commit()
+
+        logger.info(
+            f"Built summary tree for document {self.document_id}: "
+            f"{len(levels[0])} leaves, {len(levels)} levels"
+        )
+        return levels[-1][0]["content"]
+
+
+class SummaryTree:
+    @staticmethod
+    def covering_nodes(nodes: List[SummaryNode], start_page: int, end_page: int) -> List[SummaryNode]:
+        """
+        Pick the fewest stored nodes that cover [start_page, end_page]: the
+        largest nodes fully inside the range, plus any leaf that only partly
+        overlaps its edges. Returned in page order.
+        """
+        selected = []
+
+        def covered(node):
+            return any(s.page_start <= node.page_start and node.page_end <= s.page_end for s in selected)
+
+        for node in sorted(nodes, key=lambda n: (-n.level, n.page_start)):
+            if start_page <= node.page_start and node.page_end <= end_page and not covered(node):
+                selected.append(node)
+        for node in nodes:
+            overlaps = node.page_start <= end_page and start_page <= node.page_end
+            if node.level == 0 and overlaps and not covered(node):
+                selected.append(node)
+
+        return sorted(selected, key=lambda n: n.page_start)
+
+    @staticmethod
+    async def summarize_range(document_id: int, start_page: int, end_page: int, db: Session) -> Optional[str]:
+        """
+        Summarise pages start_page..end_page from cached tree nodes only.
+        Returns None if the document has no summary tree.
+        """
+        nodes = db.query(SummaryNode).filter(SummaryNode.document_id == document_id).all()
+        if not nodes:
+            return None
+
+        selected = SummaryTree.covering_nodes(nodes, start_page, end_page)
+        if not selected:
+            return ""
+        if len(selected) == 1:
+            return selected[0].content
+        return await AIService.combine_summaries([node.content for node in selected])
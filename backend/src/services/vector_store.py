@@ -1,100 +1,223 @@
-import chromadb
-from chromadb.config import Settings
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import asyncio
+import functools
+import hashlib
 import os
+import threading
+import time
 from .ai_service import AIService
-import uuid
+from .numpy_index import NumpyIndex
+from .lexical_index import LexicalIndex
+from .chunker import Chunker
+from ..config import settings
+from ..utils.cache import query_embedding_cache
+
+LEGACY_COLLECTION = "documents"
+
+class IOPool:
+    """
+    Bounded thread pool for blocking vector store calls (Chroma, local index
+    files), so they never run on the event loop.
+    """
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"vector-{name}")
+        self.pending = 0
+        self.completed = 0
+
+    async def run(self, fn, *args, **kwargs):
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, functools.partial(fn, *args, **kwargs)
+            )
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "pending": self.pending, "completed": self.completed}
 
 class VectorStore:
     """
     Vector store implementation using ChromaDB.
     """
     def __init__(self):
-        # Initialize persistent ChromaDB client
-        persist_directory = os.path.join(os.getcwd(), "storage", "chromadb")
+        # The Chroma client is created on first use, so importing this module
+        # (in every worker and maintenance script) stays cheap
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._collections = {}
+        self.numpy_index = NumpyIndex(
+            os.path.join(os.getcwd(), settings.NUMPY_INDEX_DIR),
+            settings.NUMPY_INDEX_DTYPE
+        )
+        self.lexical_index = LexicalIndex(os.path.join(os.getcwd(), settings.LEXICAL_INDEX_DIR))
+        # Interactive searches and bulk ingestion get separate pools, so a large
+        # upsert never queues a chat query behind it
+        self.reads = IOPool("read", settings.VECTOR_READ_CONCURRENCY)
+        self.writes = IOPool("write", settings.VECTOR_WRITE_CONCURRENCY)
+
+    @staticmethod
+    def _create_client():
+        """
+        Build the client for the configured CHROMA_MODE:
+        - "embedded": a PersistentClient on CHROMA_PERSIST_DIR, for a single worker
+        - "http": a client of one shared Chroma server (see docker-compose.yml),
+          which is then the only writer, so any number of API and ingestion
+          workers can run. The HTTP client keeps a pooled keep-alive session.
+        """
+        import chromadb
+        from chromadb.config import Settings
+
+        if settings.CHROMA_MODE == "http":
+            return chromadb.HttpClient(
+                host=settings.CHROMA_HOST,
+                port=settings.CHROMA_PORT,
+                settings=Settings(anonymized_telemetry=False)
+            )
+
+        persist_directory = os.path.join(os.getcwd(), settings.CHROMA_PERSIST_DIR)
         os.makedirs(persist_directory, exist_ok=True)
-        
-        self.client = chromadb.PersistentClient(path=persist_directory)
-        self.collection = self.client.get_or_create_collection(name="documents")
+        return chromadb.PersistentClient(path=persist_directory)
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    @property
+    def collection(self):
+        """The original single collection holding every document."""
+        return self.get_collection(LEGACY_COLLECTION)
+
+    def get_collection(self, name: str):
+        if name not in self._collections:
+            self._collections[name] = self.client.get_or_create_collection(name=name)
+        return self._collections[name]
 
-    async def add_document(self, document_id: int, text: str, pages: List[dict] = None):
+    @staticmethod
+    def shard_name(user_id: Optional[int], document_id: int) -> str:
         """
-        Splits text into chunks, generates embeddings, and indexes them in ChromaDB.
+        Name of the collection holding a document's chunks under the configured
+        VECTOR_SHARDING strategy:
+        - "none": every chunk in the single "documents" collection
+        - "user": one collection per owner, so queries scale with tenant size
+        - "bucket": VECTOR_SHARD_BUCKETS collections chosen by hashing the document id
+        Documents with no known owner stay in the legacy collection.
         """
-        chunk_size = 1000
-        overlap = 100
-        
-        embeddings = []
-        ids = []
-        metadatas = []
-        documents = []
+        if settings.VECTOR_SHARDING == "user" and user_id is not None:
+            return f"documents_u{user_id}"
+        if settings.VECTOR_SHARDING == "bucket":
+            digest = hashlib.sha1(str(document_id).encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "big") % settings.VECTOR_SHARD_BUCKETS
+            return f"documents_b{bucket}"
+        return LEGACY_COLLECTION
+
+    def collection_for(self, user_id: Optional[int], document_id: int):
+        return self.get_collection(self.shard_name(user_id, document_id))
+
+    def indexer(self, document_id: int, user_id: Optional[int] = None) -> "DocumentIndexer":
+        """
+        Returns an incremental indexer that chunks, embeds and upserts a
+        document's pages in bounded batches as they are fed.
+        """
+        return DocumentIndexer(self, document_id, user_id)
 
+    async def add_document(self, document_id: int, text: str, pages: List[dict] = None, user_id: Optional[int] = None):
+        """
+        Splits text into chunks, generates embeddings, and indexes them in ChromaDB.
+        """
+        indexer = self.indexer(document_id, user_id)
         if pages:
             # Process per page
             for page in pages:
-                page_text = page["text"]
-                page_num = page["page_number"]
-                
-                # Split page text into chunks
-                for i in range(0, len(page_text), chunk_size - overlap):
-                    chunk = page_text[i:i + chunk_size]
-                    if len(chunk) > 50:
-                        embedding = await AIService.get_embeddings(chunk)
-                        embeddings.append(embedding)
-                        ids.append(f"doc_{document_id}_p{page_num}_c{i}")
-                        metadatas.append({
-                            "document_id": document_id,
-                            "page_number": page_num,
-                            "text": chunk
-                        })
-                        documents.append(chunk)
+                await indexer.add_page(page)
         else:
             # Fallback: simple character-based splitting
-            chunks = []
-            for i in range(0, len(text), chunk_size - overlap):
-                chunk = text[i:i + chunk_size]
-                if len(chunk) > 50:
-                    chunks.append(chunk)
-            
-            for i, chunk in enumerate(chunks):
-                embedding = await AIService.get_embeddings(chunk)
-                embeddings.append(embedding)
-                ids.append(f"doc_{document_id}_chunk_{i}")
-                metadatas.append({
-                    "document_id": document_id,
-                    "page_number": 0, # Unknown page
-                    "text": chunk
-                })
-                documents.append(chunk)
+            await indexer.add_text(text)
+        await indexer.finish()
 
-        if not documents:
-            return
+    async def delete_document(self, document_id: int, user_id: Optional[int] = None) -> None:
+        """
+        Removes every chunk of a document from its shard (and from the legacy
+        collection, where documents indexed before sharding may still live).
+        """
+        def delete():
+            collection = self.collection_for(user_id, document_id)
+            collection.delete(where={"document_id": document_id})
+            if collection is not self.collection:
+                self.collection.delete(where={"document_id": document_id})
+            self.numpy_index.delete(document_id)
+            self.lexical_index.delete(document_id)
 
-        # 3. Add to ChromaDB
-        self.collection.upsert(
-            ids=ids,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            documents=documents
-        )
-        print(f"Indexed {len(documents)} chunks for document {document_id}")
+        await self.writes.run(delete)
+
+    def list_collection_names(self) -> List[str]:
+        """Names of every collection that holds document chunks."""
+        names = []
+        for collection in self.client.list_collections():
+            # Newer chromadb versions return names, older ones Collection objects
+            name = collection if isinstance(collection, str) else collection.name
+            if name == LEGACY_COLLECTION or name.startswith(f"{LEGACY_COLLECTION}_"):
+                names.append(name)
+        return names
+
+    async def lexical_search(self, document_id: int, query: str, limit: int = 3) -> Optional[dict]:
+        """BM25 search over one document's lexical index (see LexicalIndex.search)."""
+        return await self.reads.run(self.lexical_index.search, document_id, query, limit)
 
-    async def search(self, document_id: int, query: str, limit: int = 3) -> List[dict]:
+    def stats(self) -> dict:
+        return {"read": self.reads.stats(), "write": self.writes.stats()}
+
+    async def embed_query(self, query: str) -> List[float]:
+        model = AIService.get_provider().embedding_model
+        embedding = query_embedding_cache.get(model, query)
+        if embedding is None:
+            embedding = await AIService.get_embeddings(query)
+            query_embedding_cache.put(model, query, embedding)
+        return embedding
+
+    async def search(self, document_id: int, query: str, limit: int = 3, user_id: Optional[int] = None) -> List[dict]:
         """
         Performs semantic search for a specific document.
         Returns list of dicts with text and metadata.
         """
-        # 1. Generate embedding for query
-        query_embedding = await AIService.get_embeddings(query)
-        
-        # 2. Query ChromaDB
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=limit,
-            where={"document_id": document_id}  # Filter by document_id
-        )
-        
-        # 3. Extract results
+        # 1. Generate embedding for query (repeated questions are served from memory)
+        query_embedding = await self.embed_query(query)
+
+        # 2. Exact search over the document's memory-mapped index, when enabled and built
+        if settings.VECTOR_SEARCH_BACKEND == "numpy":
+            results = await self.reads.run(self.numpy_index.search, document_id, query_embedding, limit)
+            if results is not None:
+                return [{"text": r["text"], "metadata": r["metadata"]} for r in results]
+
+        # 3. Query ChromaDB
+        def query():
+            collection = self.collection_for(user_id, document_id)
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=limit,
+                where={"document_id": document_id}  # Filter by document_id
+            )
+            if collection is not self.collection and not (results and results['documents'] and results['documents'][0]):
+                # Documents indexed before sharding live in the legacy collection
+                # until migrate_vector_shards.py has moved them
+                results = self.collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=limit,
+                    where={"document_id": document_id}
+                )
+            return results
+
+        results = await self.reads.run(query)
+
+        # 4. Extract results
         output = []
         if results and results['documents'] and results['documents'][0]:
             for i, doc_text in enumerate(results['documents'][0]):
@@ -106,5 +229,282 @@ class VectorStore:
         
         return output
 
+    def _library_queries(self, user_id: int, document_ids: List[int]) -> List[tuple]:
+        """
+        (collection, where) pairs that together cover a user's chunks under the
+        current sharding strategy.
+        """
+        queries = []
+        if settings.VECTOR_SHARDING == "user":
+            queries.append((self.get_collection(self.shard_name(user_id, 0)), {"user_id": user_id}))
+        elif settings.VECTOR_SHARDING == "bucket":
+            # Only the buckets the user's documents hash to
+            for name in sorted({self.shard_name(user_id, document_id) for document_id in document_ids}):
+                queries.append((self.get_collection(name), {"user_id": user_id}))
+        # Chunks indexed before sharding carry no user_id; match them by document
+        if document_ids and self.collection.count():
+            queries.append((self.collection, {"document_id": {"$in": document_ids}}))
+        return queries
+
+    async def search_library(self, user_id: int, document_ids: List[int], query: str,
+                             per_document: int = 3, candidates: int = 200) -> List[dict]:
+        """
+        Semantic search across all of a user's documents with one query per
+        collection (a single one under "user" sharding; one per bucket holding
+        the user's documents under "bucket"). The nearest candidates are merged
+        per document, keeping the best hit of each page and at most
+        per_document pages. Returns groups of {"document_id", "distance",
+        "hits": [{"page_number", "text", "distance"}]}, best document first.
+        Only documents with a chunk among the candidates appear.
+        """
+        query_embedding = await self.embed_query(query)
+        allowed = set(document_ids)
+
+        def query():
+            hits = []
+            for collection, where in self._library_queries(user_id, document_ids):
+                results = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=candidates,
+                    where=where
+                )
+                if not (results and results['documents'] and results['documents'][0]):
+                    continue
+                for text, metadata, distance in zip(results['documents'][0], results['metadatas'][0], results['distances'][0]):
+                    if metadata.get("document_id") in allowed:
+                        hits.append((distance, metadata["document_id"], metadata.get("page_number", 0), text))
+            return hits
+
+        hits = await self.reads.run(query)
+
+        groups = {}
+        for distance, document_id, page_number, text in sorted(hits, key=lambda hit: hit[0]):
+            group = groups.setdefault(document_id, {"document_id": document_id, "distance": distance, "hits": [], "pages": set()})
+            if page_number in group["pages"] or len(group["hits"]) >= per_document:
+                continue
+            group["pages"].add(page_number)
+            group["hits"].append({"page_number": page_number, "text": text, "distance": distance})
+
+        output = []
+        for group in groups.values():
+            del group["pages"]
+            output.append(group)
+        return output
+
+class DocumentIndexer:
+    """
+    Streaming indexer for one document: pages are chunked as they arrive
+    (see Chunker: token-sized, boundary-respecting, boilerplate and duplicates
+    skipped) and pending chunks are embedded and upserted whenever INGEST_UPSERT_BATCH
+    chunks or INGEST_MAX_BUFFER_BYTES of text are buffered. Memory stays
+    bounded regardless of document size, and the document becomes
+    searchable batch by batch.
+
+    Chunk ids are derived from the chunk's content, so re-indexing a document
+    is incremental: chunks already stored are not embedded again (only their
+    metadata is updated if they moved page), and chunks that no longer exist
+    are deleted on finish().
+
+    `timings` holds the seconds spent chunking, embedding and writing to the
+    stores (Chroma and the local indexes), for the processing record.
+    """
+    # Page size when reading the document's existing chunks
+    SCAN_BATCH = 1000
+
+    def __init__(self, store: VectorStore, document_id: int, user_id: Optional[int] = None):
+        self.store = store
+        self.document_id = document_id
+        self.user_id = user_id
+        self.indexed = 0
+        self.embedded = 0
+        self.updated = 0
+        self.deleted = 0
+        self.timings = {"chunk": 0.0, "embed": 0.0, "upsert": 0.0}
+        self._ids = []
+        self._metadatas = []
+        self._documents = []
+        self._buffered_bytes = 0
+        self._seen = set()
+        # id -> (page_number, user_id) of chunks stored before this run, loaded on first flush
+        self._existing = None
+        self.chunker = Chunker()
+        # The numpy index is written alongside Chroma and published on finish()
+        self._numpy_writer = None
+        if settings.VECTOR_SEARCH_BACKEND == "numpy":
+            self._numpy_writer = store.numpy_index.writer(document_id)
+        self._lexical_writer = None
+        if settings.LEXICAL_SEARCH:
+            self._lexical_writer = store.lexical_index.writer(document_id)
+
+    @property
+    def collection(self):
+        # Resolved (and created if needed) inside the write pool, not on the event loop
+        return self.store.collection_for(self.user_id, self.document_id)
+
+    @staticmethod
+    def content_hash(chunk: str) -> str:
+        return hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:32]
+
+    async def _add_chunk(self, page_num: int, chunk: str) -> None:
+        content_hash = self.content_hash(chunk)
+        chunk_id = f"doc_{self.document_id}_{content_hash}"
+        if chunk_id in self._seen:
+            return
+        self._seen.add(chunk_id)
+
+        self._ids.append(chunk_id)
+        metadata = {
+            "document_id": self.document_id,
+            "page_number": page_num,
+            "content_hash": content_hash,
+            "text": chunk
+        }
+        if self.user_id is not None:
+            metadata["user_id"] = self.user_id
+        self._metadatas.append(metadata)
+        self._documents.append(chunk)
+        if self._lexical_writer:
+            self._lexical_writer.add(chunk, page_num)
+        self._buffered_bytes += len(chunk.encode("utf-8"))
+
+        if (len(self._documents) >= settings.INGEST_UPSERT_BATCH
+                or self._buffered_bytes >= settings.INGEST_MAX_BUFFER_BYTES):
+            await self.flush()
+
+    async def add_page(self, page: dict) -> None:
+        start = time.perf_counter()
+        chunks = self.chunker.split_page(page["text"])
+        self.timings["chunk"] += time.perf_counter() - start
+        for chunk in chunks:
+            await self._add_chunk(page["page_number"], chunk)
+
+    async def add_text(self, text: str) -> None:
+        """Index text with no page information (page_number 0)."""
+        start = time.perf_counter()
+        chunks = self.chunker.split(text)
+        self.timings["chunk"] += time.perf_counter() - start
+        for chunk in chunks:
+            await self._add_chunk(0, chunk)
+
+    def _load_existing(self) -> dict:
+        if self._existing is None:
+            self._existing = {}
+            offset = 0
+            while True:
+                batch = self.collection.get(
+                    where={"document_id": self.document_id},
+                    limit=self.SCAN_BATCH,
+                    offset=offset,
+                    include=["metadatas"]
+                )
+                if not batch["ids"]:
+                    break
+                for chunk_id, metadata in zip(batch["ids"], batch["metadatas"]):
+                    metadata = metadata or {}
+                    self._existing[chunk_id] = (metadata.get("page_number"), metadata.get("user_id"))
+                offset += len(batch["ids"])
+        return self._existing
+
+    def _stored_embeddings(self, ids: List[str]) -> dict:
+        stored = self.collection.get(ids=ids, include=["embeddings"])
+        return dict(zip(stored["ids"], stored["embeddings"]))
+
+    async def flush(self) -> None:
+        """Embed and upsert the new buffered chunks; update moved ones."""
+        if not self._documents:
+            return
+
+        start = time.perf_counter()
+        existing = await self.store.writes.run(self._load_existing)
+        new = [i for i, chunk_id in enumerate(self._ids) if chunk_id not in existing]
+        moved = [
+            i for i, chunk_id in enumerate(self._ids)
+            if chunk_id in existing
+            and existing[chunk_id] != (self._metadatas[i]["page_number"], self._metadatas[i].get("user_id"))
+        ]
+
+        embeddings = [None] * len(self._ids)
+        if new:
+            self.timings["upsert"] += time.perf_counter() - start
+            start = time.perf_counter()
+            new_embeddings = await AIService.get_embeddings_batch([self._documents[i] for i in new])
+            self.timings["embed"] += time.perf_counter() - start
+            start = time.perf_counter()
+            await self.store.writes.run(
+                self.collection.upsert,
+                ids=[self._ids[i] for i in new],
+                embeddings=new_embeddings,
+                metadatas=[self._metadatas[i] for i in new],
+                documents=[self._documents[i] for i in new]
+            )
+            for i, embedding in zip(new, new_embeddings):
+                embeddings[i] = embedding
+        if moved:
+            await self.store.writes.run(
+                self.collection.update,
+                ids=[self._ids[i] for i in moved],
+                metadatas=[self._metadatas[i] for i in moved]
+            )
+
+        if self._numpy_writer:
+            # The local index is rebuilt in full; unchanged chunks reuse their stored vectors
+            reused = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            if reused:
+                stored = await self.store.writes.run(self._stored_embeddings, [self._ids[i] for i in reused])
+                for i in reused:
+                    embeddings[i] = stored[self._ids[i]]
+            pages = [metadata["page_number"] for metadata in self._metadatas]
+            await self.store.writes.run(self._numpy_writer.add, embeddings, self._documents, pages)
+        self.timings["upsert"] += time.perf_counter() - start
+
+        self.indexed += len(self._documents)
+        self.embedded += len(new)
+        self.updated += len(moved)
+
+        self._ids, self._metadatas, self._documents = [], [], []
+        self._buffered_bytes = 0
+
+    def abort(self) -> None:
+        """Discard the unpublished local indexes after a failed ingestion."""
+        if self._numpy_writer:
+            self._numpy_writer.abort()
+            self._numpy_writer = None
+        if self._lexical_writer:
+            self._lexical_writer.abort()
+            self._lexical_writer = None
+
+    def _publish(self) -> None:
+        """Delete chunks that vanished and publish the local indexes (blocking)."""
+        stale = [chunk_id for chunk_id in self._load_existing() if chunk_id not in self._seen]
+        for i in range(0, len(stale), self.SCAN_BATCH):
+            self.collection.delete(ids=stale[i:i + self.SCAN_BATCH])
+        self.deleted = len(stale)
+
+        if self._numpy_writer:
+            self._numpy_writer.finish()
+            self._numpy_writer = None
+        if self._lexical_writer:
+            self._lexical_writer.finish()
+            self._lexical_writer = None
+
+    async def finish(self) -> int:
+        """
+        Flush what is left, delete chunks that vanished since the last run and
+        return the number of chunks indexed.
+        """
+        await self.flush()
+
+        start = time.perf_counter()
+        await self.store.writes.run(self._publish)
+        self.timings["upsert"] += time.perf_counter() - start
+        if self.indexed or self.deleted:
+            print(
+                f"Indexed {self.indexed} chunks for document {self.document_id}: "
+                f"{self.embedded} embedded, {self.updated} moved, {self.deleted} deleted "
+                f"(skipped {self.chunker.skipped_chunks} duplicate chunks, "
+                f"{self.chunker.skipped_lines} boilerplate lines)"
+            )
+        return self.indexed
+
 # Global instance
 vector_store = VectorStore()
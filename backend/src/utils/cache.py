@@ -0,0 +1,314 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+from ..config import settings
+
+
+def _open_sqlite(path: str) -> sqlite3.Connection:
+    """Open a SQLite file shared by every worker process."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class EmbeddingCache:
+    """
+    Disk-backed, content-addressed cache of embedding vectors.
+    Entries are keyed by (model, task_type, sha256(text)), stored as packed
+    float32 blobs in SQLite and evicted least-recently-used once the cache
+    grows past max_entries.
+    """
+    # SQLite limits the number of host parameters per statement
+    _QUERY_BATCH = 500
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use so importing the module stays cheap."""
+        if self._conn is None:
+            conn = _open_sqlite(self.path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+            self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, task_type: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model}\0{task_type}\0{text}".encode("utf-8")).digest()
+
+    @staticmethod
+    def _pack(vector: List[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _unpack(blob: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def get_many(self, model: str, task_type: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up cached vectors for texts. Returns a list aligned with texts,
+        with None for every miss.
+        """
+        keys = [self.make_key(model, task_type, text) for text in texts]
+        found = {}
+        now = time.time()
+
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(keys), self._QUERY_BATCH):
+                batch = keys[start:start + self._QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+                if rows:
+                    conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, key) for key, _ in rows]
+                    )
+            conn.commit()
+
+            hit_count = sum(1 for key in keys if key in found)
+            self.hits += hit_count
+            self.misses += len(keys) - hit_count
+
+        return [self._unpack(found[key]) if key in found else None for key in keys]
+
+    def get(self, model: str, task_type: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, task_type, [text])[0]
+
+    def put_many(self, model: str, task_type: str, texts: List[str], vectors: List[List[float]]) -> None:
+        """
+        Store vectors for texts, evicting the least recently used entries if needed.
+        """
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (self.make_key(model, task_type, text), self._pack(vector), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            conn = self._connect()
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._count += conn.total_changes - before
+            if self._count > self.max_entries:
+                self._evict(conn)
+            conn.commit()
+
+    def put(self, model: str, task_type: str, text: str, vector: List[float]) -> None:
+        self.put_many(model, task_type, [text], [vector])
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        # Other workers share the file, so resync the count before trimming.
+        # Trim an extra 5% to avoid evicting on every insert once full.
+        self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+        excess += self.max_entries // 20
+        conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._count = max(0, self._count - excess)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+        }
+
+
+class ResponseCache:
+    """
+    Disk-backed cache of generated AI responses, shared by all workers.
+    Entries are keyed by (prompt kind, prompt template version, model, sha256(input)),
+    expire after ttl_seconds and are evicted least-recently-used past max_entries.
+    Values are stored as JSON so parsed results (lists, dicts) round-trip.
+    """
+    def __init__(self, path: str, max_entries: int, ttl_seconds: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = _open_sqlite(self.path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, last_used REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(kind: str, version: str, model: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{kind}:{version}:{model}:{digest}"
+
+    def get(self, key: str, record_stats: bool = True) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                if record_stats:
+                    self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+            if record_stats:
+                self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now + self.ttl_seconds, now)
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+class QueryEmbeddingCache:
+    """
+    In-process LRU cache of search query embeddings with a TTL. Questions are
+    short and repeat a lot ("resume el documento", "¿de qué trata?"), so keeping
+    their vectors in memory skips both the provider call and the disk cache.
+    Keys are (model, normalised query): case, surrounding punctuation and
+    repeated whitespace don't matter.
+    """
+    _PUNCTUATION = re.compile(r"^[\s¿¡?!.,;:\"'()]+|[\s¿¡?!.,;:\"'()]+$")
+    _WHITESPACE = re.compile(r"\s+")
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def normalize(cls, query: str) -> str:
+        query = cls._WHITESPACE.sub(" ", query.lower())
+        return cls._PUNCTUATION.sub("", query)
+
+    def _key(self, model: str, query: str) -> Tuple[str, str]:
+        return model, self.normalize(query)
+
+    def get(self, model: str, query: str) -> Optional[List[float]]:
+        key = self._key(model, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, model: str, query: str, embedding: List[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        key = self._key(model, query)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+# Global instances
+embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_ENTRIES)
+response_cache = ResponseCache(
+    settings.RESPONSE_CACHE_PATH,
+    settings.RESPONSE_CACHE_MAX_ENTRIES,
+    settings.RESPONSE_CACHE_TTL_SECONDS
+)
+query_embedding_cache = QueryEmbeddingCache(
+    settings.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+    settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS
+)
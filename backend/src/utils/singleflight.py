@@ -0,0 +1,134 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from ..config import settings
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls within a process: while a call for a key is
+    in flight, later callers with the same key await the leader's result
+    instead of starting their own. The call runs in its own task, so a caller
+    that is cancelled (e.g. a disconnected client), leader included, stops
+    waiting without cancelling it for the others.
+    """
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when nobody was left waiting for it
+        task.cancelled() or task.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.followers += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._done(key, done))
+            self._inflight[key] = task
+            self.leaders += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
+
+
+class LockTable:
+    """
+    Expiring named locks in a SQLite file shared by every worker process on
+    the host, used to elect one worker to run an expensive call.
+    """
+    def __init__(self, path: str, ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.owner = uuid.uuid4().hex
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS locks ("
+                "key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            self._conn = conn
+        return self._conn
+
+    def try_acquire(self, key: str) -> bool:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM locks WHERE key = ? AND expires_at <= ?", (key, now))
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO locks (key, owner, expires_at) VALUES (?, ?, ?)",
+                    (key, self.owner, now + self.ttl_seconds)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return cursor.rowcount == 1
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM locks WHERE key = ? AND owner = ?", (key, self.owner))
+
+
+async def run_once_across_workers(
+    key: str,
+    fn: Callable[[], Awaitable[T]],
+    lookup: Callable[[], Optional[T]],
+    poll_seconds: float = 0.25,
+) -> T:
+    """
+    Let only one worker run fn for key. Other workers poll lookup() (typically
+    a shared cache the leader writes to) until a result appears; if the
+    leader's lock is released or expires without a result, the next poller
+    to take the lock runs fn itself.
+    """
+    if not settings.SINGLEFLIGHT_CROSS_WORKER:
+        return await fn()
+
+    # The lock table and lookup() are blocking SQLite calls; keep them off the event loop
+    while not await asyncio.to_thread(lock_table.try_acquire, key):
+        await asyncio.sleep(poll_seconds)
+        result = await asyncio.to_thread(lookup)
+        if result is not None:
+            return result
+
+    try:
+        # Another worker may have finished between our lookup and acquiring
+        result = await asyncio.to_thread(lookup)
+        if result is not None:
+            return result
+        return await fn()
+    finally:
+        await asyncio.to_thread(lock_table.release, key)
+
+
+# Global instances
+single_flight = SingleFlight()
+lock_table = LockTable(settings.SINGLEFLIGHT_LOCK_PATH, settings.SINGLEFLIGHT_LOCK_TTL_SECONDS)
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import pytest
+
+from src.services.ai_scheduler import AIScheduler, CircuitBreaker, CircuitOpenError
+
+
+def make_half_open(reset_seconds: float = 30.0) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=reset_seconds)
+    breaker.record_failure()
+    # Pretend the open period has elapsed
+    breaker.opened_at = time.monotonic() - reset_seconds
+    return breaker
+
+
+def make_scheduler(breaker: CircuitBreaker) -> AIScheduler:
+    return AIScheduler(requests_per_minute=1000, tokens_per_minute=1_000_000, breaker=breaker, max_retries=0)
+
+
+def test_cancelled_half_open_trial_is_released():
+    breaker = make_half_open()
+    scheduler = make_scheduler(breaker)
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(3600)
+
+        trial = asyncio.create_task(scheduler.run(hang))
+        await started.wait()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        async def ok():
+            return "ok"
+
+        return await scheduler.run(ok)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_closed_half_open_stream_is_released():
+    breaker = make_half_open()
+    scheduler = make_scheduler(breaker)
+
+    async def scenario():
+        async def items():
+            yield "first"
+            yield "second"
+
+        stream = scheduler.stream(items)
+        assert await stream.__anext__() == "first"
+        # The client disconnected mid-stream
+        await stream.aclose()
+        breaker.before_call()
+
+    asyncio.run(scenario())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_stale_half_open_trial_expires():
+    breaker = make_half_open(reset_seconds=30.0)
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    # The trial never reported back; after reset_seconds another one is allowed
+    breaker._trial_started_at -= 30.0
+    breaker.before_call()
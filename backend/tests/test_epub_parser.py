@@ -0,0 +1,44 @@
+import zipfile
+
+from src.parsers.epub_parser import EPUBParser
+
+CONTAINER = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+PACKAGE = """<?xml version="1.0"?>
+<package version="3.0" xmlns="http://www.idpf.org/2007/opf">
+  <manifest>
+    <item id="ch1" href="Text/ch%201.xhtml#start" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine>
+    <itemref idref="ch1"/>
+  </spine>
+</package>"""
+
+CHAPTER = """<?xml version="1.0"?>
+<html xmlns="http://www.w3.org/1999/xhtml">
+  <body><p>Primer capítulo del libro.</p></body>
+</html>"""
+
+
+def make_epub(path) -> str:
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("mimetype", "application/epub+zip")
+        archive.writestr("META-INF/container.xml", CONTAINER)
+        archive.writestr("OEBPS/content.opf", PACKAGE)
+        archive.writestr("OEBPS/Text/ch 1.xhtml", CHAPTER)
+    return str(path)
+
+
+def test_spine_decodes_encoded_hrefs(tmp_path):
+    file_path = make_epub(tmp_path / "book.epub")
+
+    with zipfile.ZipFile(file_path) as archive:
+        assert EPUBParser._spine(archive) == ["OEBPS/Text/ch 1.xhtml"]
+
+    pages = list(EPUBParser.iter_pages(file_path))
+    assert [page["text"] for page in pages] == ["Primer capítulo del libro."]
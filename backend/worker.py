@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import logging
+import signal
+from src.config import settings
+from src.models.user import User
+from src.models.document import Document
+from src.models.chat import ChatMessage
+from src.models.summary import SummaryNode
+from src.models.page import DocumentPage
+from src.models.job import Job
+from src.models.processing import ProcessingRecord
+from src.services.job_worker import JobWorker
+
+async def main(concurrency: int):
+    worker = JobWorker(concurrency)
+    loop = asyncio.get_running_loop()
+    # Finish the jobs in hand on shutdown; unfinished ones are retried after their lock expires
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    await worker.run()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued background jobs (document ingestion).")
+    parser.add_argument("--concurrency", type=int, default=None, help="Jobs run at once (default: JOB_CONCURRENCY)")
+    parser.add_argument("--allow-embedded-chroma", action="store_true",
+                        help="Start even with CHROMA_MODE=embedded (only safe while the API is not running)")
+    args = parser.parse_args()
+    # An embedded Chroma lives inside one process: chunks written here would not be
+    # visible to the API, and two processes writing the same directory can corrupt it
+    if settings.CHROMA_MODE == "embedded" and not args.allow_embedded_chroma:
+        parser.error(
+            "CHROMA_MODE=embedded cannot be shared with the API process. Run a Chroma server and set "
+            "CHROMA_MODE=http and CHROMA_HOST (and CHROMA_PORT), or pass --allow-embedded-chroma "
+            "if the API is not running."
+        )
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main(args.concurrency))
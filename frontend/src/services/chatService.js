@@ -4,5 +4,50 @@ export const chatService = {
     sendMessage: async (documentId, message) => {
         const response = await api.post(`/documents/${documentId}/chat`, { message });
         return response.data;
+    },
+
+    // Streams the answer over Server-Sent Events.
+    // handlers: { onSources(sources), onToken(text), onDone() }
+    streamMessage: async (documentId, message, handlers = {}) => {
+        const token = localStorage.getItem('token');
+        const response = await fetch(`${api.defaults.baseURL}/documents/${documentId}/chat/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                ...(token ? { Authorization: `Bearer ${token}` } : {}),
+            },
+            body: JSON.stringify({ message }),
+        });
+        if (!response.ok) {
+            throw new Error(`Chat stream failed with status ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                for (const line of rawEvent.split('\n')) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                }
+                const payload = data ? JSON.parse(data) : null;
+
+                if (event === 'sources') handlers.onSources?.(payload);
+                else if (event === 'token') handlers.onToken?.(payload);
+                else if (event === 'done') handlers.onDone?.();
+            }
+        }
     }
 };
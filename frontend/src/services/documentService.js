@@ -24,23 +24,52 @@ export const documentService = {
         return response.data;
     },
 
+    searchLibrary: async (query, { page = 1, pageSize = 10, perDocument = 3 } = {}) => {
+        const response = await api.get('/documents/search', {
+            params: { q: query, page, page_size: pageSize, per_document: perDocument },
+        });
+        return response.data;
+    },
+
     getDocument: async (id) => {
         const response = await api.get(`/documents/${id}`);
         return response.data;
     },
 
-    getGlossary: async (id) => {
-        const response = await api.post(`/documents/${id}/glossary`);
+    reprocessDocument: async (id, file = null) => {
+        const formData = new FormData();
+        if (file) formData.append('file', file);
+
+        const response = await api.post(`/documents/${id}/reprocess`, formData, {
+            headers: {
+                'Content-Type': 'multipart/form-data',
+            },
+        });
+        return response.data;
+    },
+
+    getProcessing: async (id) => {
+        const response = await api.get(`/documents/${id}/processing`);
         return response.data;
     },
 
-    generateQuiz: async (id) => {
-        const response = await api.post(`/documents/${id}/quiz`);
+    getGlossary: async (id, regenerate = false) => {
+        const response = await api.post(`/documents/${id}/glossary`, null, {
+            params: { regenerate },
+        });
+        return response.data;
+    },
+
+    generateQuiz: async (id, regenerate = false) => {
+        const response = await api.post(`/documents/${id}/quiz`, null, {
+            params: { regenerate },
+        });
         return response.data;
     },
 
-    downloadStudyGuide: async (id) => {
+    downloadStudyGuide: async (id, regenerate = false) => {
         const response = await api.post(`/documents/${id}/study-guide`, null, {
+            params: { regenerate },
             responseType: 'blob', // Important for file download
         });
         return response.data; // This is a Blob